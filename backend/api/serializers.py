@@ -1,14 +1,19 @@
-from django.db.models import F
+from django.conf import settings
+from django.db import transaction
 from djoser.serializers import (UserCreateSerializer as
                                 DjoserUserCreateSerializer)
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.exceptions import ValidationError
+from rest_framework.fields import ImageField, SkipField
 from rest_framework.serializers import BooleanField
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        PrimaryKeyRelatedField,
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer,
                                         SerializerMethodField)
 
+from core import (cards, feed, images, search, shopping_cart, signals,
+                  similar, subscriptions)
 from core.constants import (MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT,
                             MIN_COOKING_TIME)
 from recipes.models import Cart, Ingredient, Recipe, IngredientInRecipe, Tag
@@ -39,9 +44,11 @@ class UserSerializer(DjoserUserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return not (user.is_anonymous or not user.subscriber_user.filter(
-                    author=obj).exists())
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in subscriptions.get_subscribed_author_ids(
+            self.context['request']
+        )
 
 
 class SubscriptionSerializer(UserSerializer):
@@ -70,13 +77,18 @@ class SubscriptionSerializer(UserSerializer):
         )
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipe_author.count()
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['request'].GET.get('recipes_limit')
-        recipes = obj.recipe_author.all()[:int(
-            recipes_limit)] if recipes_limit else obj.recipe_author.all()
-        return RecipeShortSerializer(recipes, many=True, read_only=True).data
+        """Рецепты авторов собирает get_authors_recipes: одним запросом
+        и с проверенным recipes_limit."""
+        return RecipeShortSerializer(
+            self.context['authors_recipes'][obj.id],
+            many=True,
+            read_only=True,
+        ).data
 
     def validate(self, data):
         author = self.instance
@@ -94,6 +106,7 @@ class SubscriptionSerializer(UserSerializer):
 
 class RecipeShortSerializer(ModelSerializer):
     image = Base64ImageField()
+    images = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -101,6 +114,7 @@ class RecipeShortSerializer(ModelSerializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time',
         )
         read_only_fields = (
@@ -110,6 +124,11 @@ class RecipeShortSerializer(ModelSerializer):
             'cooking_time',
         )
 
+    def get_images(self, obj):
+        return images.get_rendition_urls(
+            obj.image_hash, request=self.context.get('request')
+        )
+
 
 class TagSerializer(ModelSerializer):
 
@@ -147,6 +166,7 @@ class RecipeReadSerializer(ModelSerializer):
     is_favorited = BooleanField(default=False)
     is_in_shopping_cart = BooleanField(default=False)
     ingredients = SerializerMethodField()
+    images = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -159,20 +179,50 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
 
-    def get_ingredients(self, obj):
-        return (
-            obj.ingredients.values(
-                'id',
-                'name',
-                'measurement_unit',
-                amount=F('ingredientinrecipe__amount')
-            )
+    def get_images(self, obj):
+        return images.get_rendition_urls(
+            obj.image_hash, request=self.context.get('request')
         )
 
+    def get_ingredients(self, obj):
+        return [
+            {
+                'id': ingredient_in_recipe.ingredient.id,
+                'name': ingredient_in_recipe.ingredient.name,
+                'measurement_unit': (
+                    ingredient_in_recipe.ingredient.measurement_unit
+                ),
+                'amount': ingredient_in_recipe.amount,
+            }
+            for ingredient_in_recipe in obj.ingredientinrecipe_set.all()
+        ]
+
+
+class RecipeImageField(ImageField):
+    """Картинка рецепта в base64.
+
+    В запросе только считается хеш картинки: декодирует и сохраняет
+    ее пул обработки картинок под этим хешем. Если картинка совпадает
+    с уже сохраненной в рецепте, поле пропускается.
+    """
+
+    def to_internal_value(self, base64_data):
+        if not isinstance(base64_data, str) or not base64_data:
+            raise ValidationError('Загрузите картинку в base64.')
+        try:
+            upload = images.read_image_upload(base64_data)
+        except ValueError as error:
+            raise ValidationError(str(error))
+        instance = getattr(self.parent, 'instance', None)
+        if upload.image_hash == getattr(instance, 'image_hash', ''):
+            raise SkipField()
+        return upload
+
 
 class WriteRecipeSerializer(ModelSerializer):
     ingredients = IngredientInRecipeSerializer(many=True)
@@ -180,7 +230,7 @@ class WriteRecipeSerializer(ModelSerializer):
         queryset=Tag.objects.all(),
         many=True,
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
     author = DjoserUserSerializer(read_only=True)
     cooking_time = IntegerField(
         min_value=MIN_COOKING_TIME,
@@ -230,18 +280,85 @@ class WriteRecipeSerializer(ModelSerializer):
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
+        upload = validated_data.pop('image')
+        recipe = Recipe.objects.create(image=upload.name, **validated_data)
         recipe.tags.set(tags)
         self.add_ingredients(recipe, ingredients)
+        search.refresh_search_index([recipe.id])
+        cards.invalidate_recipe_cards([recipe.id])
+        similar.mark_recipes_changed([recipe.id])
+        images.schedule_recipe_image(recipe.id, upload)
+        feed.schedule_feed_fanout(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.add_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        """Обновляем рецепт, записывая только то, что изменилось."""
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        upload = validated_data.pop('image', None)
+        if upload is not None:
+            validated_data['image'] = upload.name
+            validated_data['image_hash'] = ''
+        changed = {
+            attr: value for attr, value in validated_data.items()
+            if attr == 'image' or getattr(instance, attr) != value
+        }
+        if changed:
+            instance = super().update(instance, changed)
+        if 'image' in changed:
+            images.schedule_recipe_image(instance.id, upload)
+        return instance
+
+    def update_tags(self, recipe, tags):
+        if set(recipe.tags.values_list('id', flat=True)) != {
+            tag.id for tag in tags
+        }:
+            recipe.tags.set(tags)
+
+    def update_ingredients(self, recipe, ingredients):
+        shopping_cart.lock_recipes([recipe.id])
+        rows = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in rows.items()
+        }
+        new_amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        if old_amounts == new_amounts:
+            return
+        to_update = []
+        for ingredient_id, amount in new_amounts.items():
+            row = rows.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        with signals.recipe_ingredients_handled():
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=old_amounts.keys() - new_amounts,
+            ).delete()
+        IngredientInRecipe.objects.bulk_update(to_update, ('amount',))
+        self.add_ingredients(recipe, [
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in rows
+        ])
+        shopping_cart.update_recipe_in_cart_totals(
+            recipe_id=recipe.id,
+            old_amounts=old_amounts,
+            new_amounts=new_amounts,
+        )
+        search.refresh_search_index([recipe.id])
+        cards.invalidate_recipe_cards([recipe.id])
+        similar.mark_recipes_changed([recipe.id])
 
     def add_ingredients(self, recipe, ingredients):
         IngredientInRecipe.objects.bulk_create(
@@ -265,3 +382,17 @@ class CartSerializer(ModelSerializer):
         model = Cart
         fields = '__all__'
         ordering = '-add_to_shopping_cart_date'
+
+
+class RecipeBatchSerializer(Serializer):
+    recipes = ListField(child=IntegerField(min_value=1))
+
+    def validate_recipes(self, recipes):
+        if not recipes:
+            raise ValidationError("Передайте хотя бы один рецепт!")
+        if len(recipes) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise ValidationError(
+                "За один запрос можно передать не больше "
+                f"{settings.RECIPE_BATCH_MAX_SIZE} рецептов!"
+            )
+        return list(dict.fromkeys(recipes))
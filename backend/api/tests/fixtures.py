@@ -0,0 +1,77 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def clear_caches():
+    """Сбрасываем кеши между тестами: они живут дольше тестовой базы."""
+    for name in ('default', 'recipe_cards'):
+        caches[name].clear()
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        password='password',
+        first_name='Имя',
+        last_name='Фамилия',
+    )
+
+
+def create_tags():
+    return [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in TAGS
+    ]
+
+
+def create_ingredients(count):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(count)
+    ]
+
+
+def create_recipe(author, name, tags, ingredients, amount=10):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        image='recipes/images/recipe.jpg',
+        text='Описание рецепта',
+        cooking_time=10,
+    )
+    recipe.tags.set(tags)
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+        )
+    return client
+
+
+class CacheTestCase(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
@@ -0,0 +1,97 @@
+from threading import Barrier, Thread
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from core.shopping_cart import get_live_cart_totals, get_stored_cart_totals
+
+from api.tests.fixtures import (clear_caches, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+from recipes.models import Cart, FavoriteRecipe, Recipe
+
+THREADS = 8
+ROUNDS = 10
+ALLOWED_STATUSES = {201, 204, 400}
+ACTIONS = {
+    'favorite': (FavoriteRecipe, 'favorites_count'),
+    'shopping_cart': (Cart, 'in_carts_count'),
+}
+
+
+class ConcurrentUserRecipesTest(TransactionTestCase):
+    """Параллельные добавления и удаления одного рецепта одним
+    пользователем не дают 500, дублей и расхождения счетчиков."""
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.user = create_user(0)
+        self.recipe = create_recipe(
+            create_user(1), 'Рецепт', create_tags(), create_ingredients(3)
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def run_threads(self, action):
+        url = f'/api/recipes/{self.recipe.id}/{action}/'
+        barrier = Barrier(THREADS)
+        self.statuses = []
+
+        def work(number):
+            client = get_client()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            try:
+                barrier.wait()
+                for round_number in range(ROUNDS):
+                    method = (
+                        client.post if (number + round_number) % 2
+                        else client.delete
+                    )
+                    self.statuses.append(method(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            Thread(target=work, args=(number,)) for number in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.statuses
+
+    def test_parallel_add_and_remove(self):
+        for action, (model, counter) in ACTIONS.items():
+            with self.subTest(action=action):
+                statuses = self.run_threads(action)
+                self.assertEqual(len(statuses), THREADS * ROUNDS)
+                self.assertLessEqual(set(statuses), ALLOWED_STATUSES)
+                rows = model.objects.filter(
+                    user=self.user, recipe=self.recipe
+                ).count()
+                self.assertLessEqual(rows, 1)
+                self.assertEqual(
+                    getattr(Recipe.objects.get(id=self.recipe.id), counter),
+                    rows,
+                )
+                self.assertEqual(
+                    get_stored_cart_totals(), get_live_cart_totals()
+                )
+
+    def test_parallel_add_leaves_one_row(self):
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        client = get_client()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.delete(url)
+        self.run_threads('shopping_cart')
+        client.post(url)
+        self.assertEqual(
+            Cart.objects.filter(user=self.user, recipe=self.recipe).count(),
+            1,
+        )
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).in_carts_count, 1
+        )
+        self.assertEqual(get_stored_cart_totals(), get_live_cart_totals())
+        self.assertTrue(get_stored_cart_totals())
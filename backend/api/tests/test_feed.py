@@ -0,0 +1,107 @@
+from django.test import override_settings
+
+from core.feed import schedule_feed_fanout
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+from recipes.models import FeedEntry, FeedPullAuthor
+
+
+@override_settings(FEED_FANOUT_SYNC=True)
+class FeedTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags()
+        cls.ingredients = create_ingredients(2)
+        cls.user = create_user(0)
+        cls.authors = [create_user(number) for number in (1, 2)]
+        cls.recipes = {
+            author.id: [
+                cls.create_recipe(author, number) for number in range(2)
+            ]
+            for author in cls.authors
+        }
+
+    @classmethod
+    def create_recipe(cls, author, number):
+        return create_recipe(
+            author, f'Рецепт {author.id}-{number}', cls.tags,
+            cls.ingredients,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = get_client(self.user)
+
+    def subscribe(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def unsubscribe(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                f'/api/users/{author.id}/subscribe/'
+            )
+        self.assertEqual(response.status_code, 204)
+
+    def publish(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(author, 'new')
+            schedule_feed_fanout(recipe.id)
+        return recipe
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/', {'limit': 50})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def get_expected(self, *authors):
+        return [
+            recipe.id for recipe in sorted(
+                (
+                    recipe for author in authors
+                    for recipe in self.recipes[author.id]
+                ),
+                key=lambda recipe: (recipe.pub_date, recipe.id),
+                reverse=True,
+            )
+        ]
+
+    def test_subscribe_publish_unsubscribe(self):
+        first, second = self.authors
+        self.subscribe(first)
+        self.subscribe(second)
+        self.assertEqual(self.get_feed(), self.get_expected(first, second))
+        self.recipes[first.id].append(self.publish(first))
+        self.assertEqual(self.get_feed(), self.get_expected(first, second))
+        self.unsubscribe(first)
+        self.assertEqual(self.get_feed(), self.get_expected(second))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user, author=first).exists()
+        )
+        self.publish(first)
+        self.assertEqual(self.get_feed(), self.get_expected(second))
+
+    def test_resubscribe_backfills_new_recipes(self):
+        author = self.authors[0]
+        self.subscribe(author)
+        self.unsubscribe(author)
+        self.recipes[author.id].append(self.publish(author))
+        self.subscribe(author)
+        self.assertEqual(self.get_feed(), self.get_expected(author))
+
+    @override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=0)
+    def test_pull_author(self):
+        first, second = self.authors
+        self.subscribe(first)
+        self.subscribe(second)
+        self.recipes[first.id].append(self.publish(first))
+        self.assertTrue(
+            FeedPullAuthor.objects.filter(author=first).exists()
+        )
+        self.assertEqual(self.get_feed(), self.get_expected(first, second))
+        self.unsubscribe(first)
+        self.assertEqual(self.get_feed(), self.get_expected(second))
@@ -0,0 +1,66 @@
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+
+POPULAR_URL = '/api/recipes/?ordering=popular'
+
+
+class RecipeEtagTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags()
+        ingredients = create_ingredients(3)
+        cls.user = create_user(0)
+        cls.recipes = [
+            create_recipe(cls.user, f'Рецепт {number}', tags, ingredients)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = get_client(self.user)
+
+    def get_etag(self, client):
+        response = client.get(POPULAR_URL)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag'], response.json()['results']
+
+    def change(self, method, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                f'/api/recipes/{self.recipes[0].id}/{action}/'
+            )
+        self.assertLess(response.status_code, 300)
+
+    def test_etag_changes_with_popularity(self):
+        anonymous = get_client()
+        for method, action in (
+            ('post', 'favorite'),
+            ('delete', 'favorite'),
+            ('post', 'shopping_cart'),
+        ):
+            with self.subTest(method=method, action=action):
+                etag, _ = self.get_etag(anonymous)
+                self.assertEqual(
+                    anonymous.get(
+                        POPULAR_URL, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    304,
+                )
+                self.change(method, action)
+                new_etag, _ = self.get_etag(anonymous)
+                self.assertNotEqual(new_etag, etag)
+                self.assertNotEqual(
+                    anonymous.get(
+                        POPULAR_URL, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    304,
+                )
+
+    def test_favorite_moves_recipe_up(self):
+        _, results = self.get_etag(get_client())
+        self.assertNotEqual(results[0]['id'], self.recipes[0].id)
+        self.change('post', 'favorite')
+        _, results = self.get_etag(get_client())
+        self.assertEqual(results[0]['id'], self.recipes[0].id)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from base64 import b64encode
+from io import BytesIO
+from unittest import mock
+
+from django.test import override_settings
+from PIL import Image
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_tags, create_user, get_client)
+from recipes.models import Recipe
+
+
+def get_image(color):
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, format='PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+class RecipeImagesTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.tags = create_tags()
+        cls.ingredients = create_ingredients(1)
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings = override_settings(
+            MEDIA_ROOT=media.name, IMAGE_PIPELINE_SYNC=True
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = get_client(self.user)
+
+    def create_recipe(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/recipes/', {
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'tags': [self.tags[0].id],
+                'ingredients': [
+                    {'id': self.ingredients[0].id, 'amount': 10}
+                ],
+                'image': image,
+            }, format='json')
+
+    def test_same_image_is_stored_once(self):
+        image = get_image('red')
+        recipes = []
+        for _ in range(2):
+            response = self.create_recipe(image)
+            self.assertEqual(response.status_code, 201)
+            recipes.append(Recipe.objects.get(id=response.json()['id']))
+        self.assertEqual(recipes[0].image.name, recipes[1].image.name)
+        self.assertTrue(recipes[0].image_hash)
+        self.assertEqual(recipes[0].image_hash, recipes[1].image_hash)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'recipes/images')),
+            [os.path.basename(recipes[0].image.name)],
+        )
+
+    @override_settings(IMAGE_PIPELINE_SYNC=False)
+    def test_image_is_decoded_off_request(self):
+        with mock.patch('core.images.get_executor') as executor:
+            response = self.create_recipe(get_image('green'))
+        self.assertEqual(response.status_code, 201)
+        executor.return_value.submit.assert_called_once()
+        recipe = Recipe.objects.get(id=response.json()['id'])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, recipe.image.name))
+        )
+
+    def test_invalid_image(self):
+        for image in ('не картинка', b64encode(b'text').decode()):
+            with self.subTest(image=image):
+                response = self.create_recipe(image)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.json())
@@ -0,0 +1,90 @@
+from api.tests.fixtures import (CacheTestCase, clear_caches,
+                                create_ingredients, create_recipe, create_tags,
+                                create_user, get_client)
+from recipes.models import Cart, FavoriteRecipe
+
+# Запросов к базе на список и карточку рецепта: без кеша карточек
+# и с ним. Число не зависит от размера страницы.
+LIST_QUERIES = 5
+CACHED_LIST_QUERIES = 2
+DETAIL_QUERIES = 4
+CACHED_DETAIL_QUERIES = 1
+PAGE_SIZES = (2, 10)
+
+
+class RecipeQueriesTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags()
+        ingredients = create_ingredients(10)
+        cls.users = [create_user(number) for number in range(3)]
+        cls.recipes = [
+            create_recipe(
+                cls.users[number % 3],
+                f'Рецепт {number}',
+                tags[:1 + number % 3],
+                ingredients[number % 5:number % 5 + 3],
+            )
+            for number in range(12)
+        ]
+        for recipe in cls.recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.users[0], recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            Cart.objects.create(user=cls.users[0], recipe=recipe)
+
+    def get_clients(self):
+        client = get_client(self.users[0])
+        # Первый запрос проверяет токен по базе, дальше он в кеше.
+        client.get('/api/tags/')
+        return {'anonymous': get_client(), 'authenticated': client}
+
+    def assert_queries(self, client, url, queries, cached_queries):
+        clear_caches()
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(cached_queries):
+            self.assertEqual(client.get(url).json(), response.json())
+        return response.json()
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for name, client in self.get_clients().items():
+            for limit in PAGE_SIZES:
+                with self.subTest(client=name, limit=limit):
+                    data = self.assert_queries(
+                        client,
+                        f'/api/recipes/?limit={limit}',
+                        LIST_QUERIES,
+                        CACHED_LIST_QUERIES,
+                    )
+                    self.assertEqual(len(data['results']), limit)
+
+    def test_detail_queries(self):
+        for name, client in self.get_clients().items():
+            for recipe in self.recipes[:2]:
+                with self.subTest(client=name, recipe=recipe.id):
+                    data = self.assert_queries(
+                        client,
+                        f'/api/recipes/{recipe.id}/',
+                        DETAIL_QUERIES,
+                        CACHED_DETAIL_QUERIES,
+                    )
+                    self.assertEqual(len(data['ingredients']), 3)
+
+    def test_flags_of_authenticated_user(self):
+        client = self.get_clients()['authenticated']
+        results = {
+            recipe['id']: recipe for recipe in client.get(
+                '/api/recipes/?limit=12'
+            ).json()['results']
+        }
+        for number, recipe in enumerate(self.recipes):
+            with self.subTest(recipe=recipe.id):
+                self.assertEqual(
+                    results[recipe.id]['is_favorited'], number % 2 == 0
+                )
+                self.assertEqual(
+                    results[recipe.id]['is_in_shopping_cart'],
+                    number % 3 == 0,
+                )
@@ -0,0 +1,61 @@
+from core.search import refresh_search_index
+
+from api.tests.fixtures import CacheTestCase, create_user, get_client
+from recipes.models import Recipe
+
+# Больше, чем раньше отдавал поиск на SQLite (1000 рецептов).
+MATCHING_RECIPES = 1010
+PAGE_SIZE = 100
+
+
+class RecipeSearchTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(0)
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=name,
+                image='recipes/images/recipe.jpg',
+                text=text,
+                cooking_time=10,
+            )
+            for name, text in (
+                *((f'Суп {number}', 'Описание') for number in range(
+                    MATCHING_RECIPES - 1
+                )),
+                ('Каша', 'Подавать с супом'),
+                ('Салат', 'Описание'),
+            )
+        )
+        refresh_search_index(Recipe.objects.values_list('id', flat=True))
+        cls.porridge = Recipe.objects.get(name='Каша')
+
+    def test_count_and_last_page(self):
+        data = get_client().get(
+            '/api/recipes/',
+            {'search': 'суп', 'limit': PAGE_SIZE,
+             'page': MATCHING_RECIPES // PAGE_SIZE + 1},
+        ).json()
+        self.assertEqual(data['count'], MATCHING_RECIPES)
+        self.assertEqual(
+            len(data['results']), MATCHING_RECIPES % PAGE_SIZE
+        )
+        self.assertIsNone(data['next'])
+        # Совпадение в описании весит меньше, чем в названии.
+        self.assertEqual(data['results'][-1]['id'], self.porridge.id)
+
+    def test_cursor_pages_cover_all_matches(self):
+        client = get_client()
+        data = client.get(
+            '/api/recipes/',
+            {'search': 'суп', 'pagination': 'cursor', 'limit': PAGE_SIZE},
+        ).json()
+        ids = [recipe['id'] for recipe in data['results']]
+        while data['next']:
+            data = client.get(data['next']).json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+        self.assertEqual(len(ids), MATCHING_RECIPES)
+        self.assertEqual(len(set(ids)), MATCHING_RECIPES)
+        self.assertEqual(ids[-1], self.porridge.id)
@@ -0,0 +1,128 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+
+from core import similar
+from core.similar import build_similar_index
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+
+CLUSTER_SIZE = 4
+
+
+class SimilarRecipesTest(CacheTestCase):
+    """Индекс с журналом изменений и пересобранный индекс дают одну
+    выдачу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        tags = create_tags()
+        cls.ingredients = create_ingredients(20)
+        cls.clusters = [
+            [
+                create_recipe(
+                    cls.user, f'Рецепт {first}-{number}', tags,
+                    cls.get_ingredients(first, 10 + first + number),
+                )
+                for number in range(CLUSTER_SIZE)
+            ]
+            for first in (0, 5)
+        ]
+        cls.moved = create_recipe(
+            cls.user, 'Переезжающий рецепт', tags, cls.get_ingredients(0, 18)
+        )
+
+    @classmethod
+    def get_ingredients(cls, first, unique):
+        return [
+            *cls.ingredients[first:first + 3], cls.ingredients[unique]
+        ]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(SIMILAR_INDEX_PATH=os.path.join(
+            directory.name, 'similar_recipes.idx'
+        ))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = get_client(self.user)
+        build_similar_index()
+
+    def get_similar(self):
+        # Рецепты кластера похожи одинаково, а веса ингредиентов после
+        # пересборки пересчитываются, поэтому порядок равных не
+        # сравниваем.
+        return {
+            recipe.id: {
+                similar['id'] for similar in self.client.get(
+                    f'/api/recipes/{recipe.id}/similar/',
+                    {'limit': CLUSTER_SIZE},
+                ).json()
+            }
+            for recipe in (self.moved, *(
+                cluster[0] for cluster in self.clusters
+            ))
+        }
+
+    def assert_same_after_rebuild(self):
+        similar = self.get_similar()
+        build_similar_index()
+        self.assertEqual(self.get_similar(), similar)
+        return similar
+
+    def test_index_matches_overlay_after_edit(self):
+        first, second = self.clusters
+        self.assertIn(
+            self.moved.id, self.assert_same_after_rebuild()[first[0].id]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.moved.id}/',
+                {'ingredients': [
+                    {'id': ingredient.id, 'amount': 10}
+                    for ingredient in self.get_ingredients(5, 19)
+                ]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        similar = self.assert_same_after_rebuild()
+        self.assertEqual(
+            similar[self.moved.id], {recipe.id for recipe in second}
+        )
+        self.assertIn(self.moved.id, similar[second[0].id])
+        self.assertNotIn(self.moved.id, similar[first[0].id])
+
+    def test_index_matches_overlay_after_delete(self):
+        second = self.clusters[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{second[1].id}/')
+        self.assertEqual(response.status_code, 204)
+        similar = self.assert_same_after_rebuild()
+        self.assertNotIn(second[1].id, similar[second[0].id])
+
+    def test_overlay_is_updated_in_place_without_lock(self):
+        index, overlay = similar.get_similar_index()
+        get_recipe_vectors = similar.get_recipe_vectors
+
+        def get_vectors(recipe_ids):
+            self.assertFalse(similar._index_lock.locked())
+            return get_recipe_vectors(recipe_ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{self.moved.id}/')
+        self.assertEqual(response.status_code, 204)
+        with mock.patch(
+            'core.similar.get_recipe_vectors', side_effect=get_vectors
+        ) as patched:
+            self.assertEqual(
+                similar.get_similar_index(), (index, overlay)
+            )
+        patched.assert_called_once_with({self.moved.id})
+        self.assertIsNone(overlay.recipes[self.moved.id])
@@ -0,0 +1,53 @@
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+
+
+class RecipesLimitTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags()
+        ingredients = create_ingredients(1)
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+        for number in range(3):
+            create_recipe(cls.author, f'Рецепт {number}', tags, ingredients)
+
+    def setUp(self):
+        super().setUp()
+        self.client = get_client(self.user)
+
+    def subscribe(self, params=''):
+        return self.client.post(
+            f'/api/users/{self.author.id}/subscribe/{params}'
+        )
+
+    def test_recipes_limit(self):
+        response = self.subscribe('?recipes_limit=2')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['recipes']), 2)
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results'][0]['recipes']), 1)
+        self.assertEqual(
+            len(self.client.get('/api/users/subscriptions/').json()[
+                'results'
+            ][0]['recipes']),
+            3,
+        )
+
+    def test_invalid_recipes_limit(self):
+        for value in ('abc', '-1', '1.5'):
+            with self.subTest(value=value):
+                response = self.subscribe(f'?recipes_limit={value}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.json())
+        self.subscribe()
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 'abc'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipes_limit', response.json())
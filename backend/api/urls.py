@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from core.async_views import get_async_urlpatterns, is_static
+from core.ingredient_index import is_ingredient_search
 
 app_name = 'api'
 
@@ -10,6 +13,20 @@ router_v1.register('ingredients', IngredientViewSet, 'ingredients')
 router_v1.register('recipes', RecipeViewSet, 'recipes')
 router_v1.register('tags', TagViewSet, 'tags')
 
+ASYNC_ROUTES = {
+    'tags-list': is_static,
+    'ingredients-list': is_ingredient_search,
+    'recipes-list': None,
+    'recipes-detail': None,
+    'recipes-feed': None,
+    'recipes-similar': None,
+    'recipes-download-shopping-cart': None,
+}
+
+router_urls = router_v1.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = get_async_urlpatterns(router_urls, ASYNC_ROUTES)
+
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
 ]
@@ -1,32 +1,32 @@
+from core import services
+from core.conditional import (conditional, get_catalog_validators,
+                              get_recipe_validators)
+from core.constants import ARGUMENTS_FOR_ACTION_DECORATORS
+from core.filters import IngredientFilter, RecipeFilter
+from core.metrics import SerializerMetricsMixin
+from core.ingredient_index import is_ingredient_search, search_ingredients
+from core.pagination import CartPagination, RecipePagination, UserPagination
+from core.permissions import IsAdminOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from api.serializers import RecipeReadSerializer
 from rest_framework.decorators import action
-from rest_framework.permissions import (
-    SAFE_METHODS,
-    IsAuthenticatedOrReadOnly
-)
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.serializers import (CartSerializer, IngredientSerializer,
+                             RecipeBatchSerializer, RecipeReadSerializer,
+                             TagSerializer, UserSerializer,
+                             WriteRecipeSerializer)
 from recipes.models import Cart, FavoriteRecipe, Ingredient, Tag
 from users.models import User
 
-from core.constants import ARGUMENTS_FOR_ACTION_DECORATORS
-from core.filters import IngredientFilter, RecipeFilter
-from core.pagination import CartPagination, DefaultPagination
-from core.permissions import IsAdminOrReadOnly
-from core import services
-
-from api.serializers import (UserSerializer, IngredientSerializer,
-                             TagSerializer, WriteRecipeSerializer,
-                             CartSerializer)
-
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(SerializerMetricsMixin, DjoserUserViewSet):
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = DefaultPagination
+    pagination_class = UserPagination
 
     @action(**ARGUMENTS_FOR_ACTION_DECORATORS.get('post'))
     def subscribe(self, request, id):
@@ -54,7 +54,7 @@ class UserViewSet(DjoserUserViewSet):
         )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(SerializerMetricsMixin, ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -62,23 +62,62 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    @conditional(get_catalog_validators('ingredients'))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional(get_catalog_validators('ingredients'))
+    def list(self, request, *args, **kwargs):
+        if not is_ingredient_search(request):
+            return super().list(request, *args, **kwargs)
+        return Response(
+            search_ingredients(request.query_params['name'])
+        )
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(SerializerMetricsMixin, ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
+    @conditional(get_catalog_validators('tags'))
+    def list(self, request, *args, **kwargs):
+        return Response(services.get_tags())
+
+    @conditional(get_catalog_validators('tags'))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(SerializerMetricsMixin, ModelViewSet):
     permission_classes = (IsAuthenticatedOrReadOnly | IsAdminOrReadOnly,)
-    pagination_class = DefaultPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
     def get_queryset(self):
         return services.get_flags(self.request)
 
+    @conditional(get_recipe_validators)
+    def list(self, request, *args, **kwargs):
+        return self.get_paginated_response(
+            services.get_recipe_cards(
+                request=request,
+                recipes=self.paginate_queryset(
+                    self.filter_queryset(self.get_queryset())
+                ),
+            )
+        )
+
+    @conditional(get_recipe_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return Response(
+            services.get_recipe_cards(
+                request=request, recipes=[self.get_object()],
+            )[0]
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -114,6 +153,56 @@ class RecipeViewSet(ModelViewSet):
             model=Cart, user=request.user, id=pk
         )
 
+    def get_batch_recipe_ids(self, request):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    @action(
+        **ARGUMENTS_FOR_ACTION_DECORATORS.get('batch'), url_path='favorite'
+    )
+    def favorite_batch(self, request):
+        return services.add_recipes_to_favorite_or_cart(
+            model=FavoriteRecipe,
+            user=request.user,
+            recipe_ids=self.get_batch_recipe_ids(request),
+        )
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        return services.delete_recipes_from_favorite_or_cart(
+            model=FavoriteRecipe,
+            user=request.user,
+            recipe_ids=self.get_batch_recipe_ids(request),
+        )
+
+    @action(
+        **ARGUMENTS_FOR_ACTION_DECORATORS.get('batch'),
+        url_path='shopping_cart',
+    )
+    def shopping_cart_batch(self, request):
+        return services.add_recipes_to_favorite_or_cart(
+            model=Cart,
+            user=request.user,
+            recipe_ids=self.get_batch_recipe_ids(request),
+        )
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        return services.delete_recipes_from_favorite_or_cart(
+            model=Cart,
+            user=request.user,
+            recipe_ids=self.get_batch_recipe_ids(request),
+        )
+
     @action(**ARGUMENTS_FOR_ACTION_DECORATORS.get('get'))
     def download_shopping_cart(self, request):
         return services.create_and_download_shopping_cart(request.user)
+
+    @action(**ARGUMENTS_FOR_ACTION_DECORATORS.get('get'))
+    def feed(self, request):
+        return services.get_feed(request)
+
+    @action(**ARGUMENTS_FOR_ACTION_DECORATORS.get('similar'))
+    def similar(self, request, pk):
+        return services.get_similar_recipes(request, self.get_object())
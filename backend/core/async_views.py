@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from core.constants import ASYNC_VIEW_METHODS
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='db'
+)
+
+
+def is_static(request):
+    return True
+
+
+def render(response):
+    # DRF рендерит ответ лениво; делаем это здесь, а не в потоке,
+    # общем для всех синхронных частей ASGI-обработчика.
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def run_with_db(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        return render(view(request, *args, **kwargs))
+    finally:
+        close_old_connections()
+
+
+def run_without_db(view, request, *args, **kwargs):
+    try:
+        return render(view(request, *args, **kwargs))
+    finally:
+        connections.close_all()
+
+
+def async_view(view, is_static=None):
+    """Асинхронная обертка над синхронным представлением.
+
+    Чтения (ASYNC_VIEW_METHODS) выполняются в пуле из ASYNC_DB_THREADS
+    потоков, поэтому соединений с базой не больше размера пула,
+    а медленные клиенты не занимают поток, пока получают ответ.
+    Запросы, для которых is_static(request) истинно, отвечаются без базы
+    (кэш, индекс в памяти) и выполняются вне пула; соединение, если оно
+    все же понадобилось, закрывается сразу. Изменяющие запросы идут
+    так же, как в синхронном представлении под ASGI.
+    """
+    with_db = sync_to_async(
+        run_with_db, thread_sensitive=False, executor=db_executor
+    )
+    without_db = sync_to_async(run_without_db, thread_sensitive=False)
+    write = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ASYNC_VIEW_METHODS:
+            return await write(request, *args, **kwargs)
+        if is_static is not None and is_static(request):
+            return await without_db(view, request, *args, **kwargs)
+        return await with_db(view, request, *args, **kwargs)
+    return wrapper
+
+
+def get_async_urlpatterns(urlpatterns, routes):
+    """Заменяем представления маршрутов routes на асинхронные.
+
+    routes: имя маршрута -> is_static для async_view.
+    """
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback, routes[pattern.name]),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in routes else pattern
+        for pattern in urlpatterns
+    ]
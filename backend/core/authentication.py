@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from copy import copy
+from hashlib import sha256
+from threading import Lock
+from time import monotonic, time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.constants import TOKEN_AUTH_CACHE_KEY, TOKEN_AUTH_REVOKED_KEY
+
+_tokens = OrderedDict()
+_lock = Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_shared_cache():
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        return caches[settings.TOKEN_AUTH_SHARED_CACHE]
+    return None
+
+
+def get_key_hash(key):
+    return sha256(key.encode()).hexdigest()
+
+
+def get_shared_key(key):
+    return TOKEN_AUTH_CACHE_KEY.format(key_hash=get_key_hash(key))
+
+
+def get_revoked_key(key):
+    return TOKEN_AUTH_REVOKED_KEY.format(key_hash=get_key_hash(key))
+
+
+def get_local_entry(key):
+    with _lock:
+        entry = _tokens.get(key)
+        if entry is None:
+            return None
+        expires, user, token, cached = entry
+        if expires < monotonic():
+            del _tokens[key]
+            return None
+        _tokens.move_to_end(key)
+        return user, token, cached
+
+
+def set_local_entry(key, user, token, cached):
+    with _lock:
+        _tokens[key] = (
+            monotonic() + settings.TOKEN_AUTH_CACHE_TTL, user, token, cached
+        )
+        _tokens.move_to_end(key)
+        while len(_tokens) > settings.TOKEN_AUTH_CACHE_SIZE:
+            _tokens.popitem(last=False)
+
+
+def is_revoked(key, cached):
+    """Токен отозван после того, как запись о нем попала в кеш."""
+    revoked = cache.get(get_revoked_key(key))
+    return revoked is not None and revoked >= cached
+
+
+def get_cached_credentials(key):
+    """Ищем пользователя по токену в памяти процесса и в общем кеше.
+
+    Запись сверяется с отметкой отзыва в общем кеше default, поэтому
+    выход и изменение пользователя в одном воркере сразу действуют
+    во всех.
+    """
+    entry = get_local_entry(key)
+    shared_cache = get_shared_cache()
+    if entry is None and shared_cache is not None:
+        entry = shared_cache.get(get_shared_key(key))
+        if entry is not None:
+            set_local_entry(key, *entry)
+    if entry is not None and is_revoked(key, entry[2]):
+        with _lock:
+            _tokens.pop(key, None)
+        entry = None
+    with _lock:
+        _stats['hits' if entry is not None else 'misses'] += 1
+    return entry
+
+
+def cache_credentials(key, user, token, cached):
+    set_local_entry(key, user, token, cached)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.set(
+            get_shared_key(key),
+            (user, token, cached),
+            settings.TOKEN_AUTH_SHARED_CACHE_TTL,
+        )
+
+
+def revoke_tokens(keys):
+    with _lock:
+        for key in keys:
+            _tokens.pop(key, None)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete_many([get_shared_key(key) for key in keys])
+    revoked = time()
+    cache.set_many(
+        {get_revoked_key(key): revoked for key in keys},
+        max(
+            settings.TOKEN_AUTH_CACHE_TTL,
+            settings.TOKEN_AUTH_SHARED_CACHE_TTL,
+        ),
+    )
+
+
+def invalidate_tokens(keys):
+    """Отзываем записи о токенах после фиксации транзакции."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: revoke_tokens(keys))
+
+
+def get_token_cache_stats():
+    with _lock:
+        hits, misses, size = _stats['hits'], _stats['misses'], len(_tokens)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'size': size,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кешем токен -> пользователь.
+
+    Удаление токена и сохранение пользователя оставляют отметку отзыва
+    в общем кеше default; записи, закешированные раньше отметки,
+    не используются ни в одном процессе.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = get_cached_credentials(key)
+        if entry is None:
+            # Время берем до чтения: отзыв во время чтения тоже учтется.
+            cached = time()
+            user, token = super().authenticate_credentials(key)
+            cache_credentials(key, copy(user), token, cached)
+            return user, token
+        user, token = entry[:2]
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return copy(user), token
@@ -0,0 +1,100 @@
+from django.core.signals import setting_changed
+from django.db.backends.postgresql import base
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.dispatch import receiver
+from psycopg2 import extensions
+
+from core.backends.postgresql.creation import DatabaseCreation
+from core.db_pool import PoolTimeoutError, close_pools, get_pool
+
+Database = base.Database
+
+
+def check_connection(connection):
+    """Проверка перед выдачей: соединение могло умереть в пуле."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return reset_connection(connection)
+
+
+def reset_connection(connection):
+    """Откатываем незавершенную транзакцию перед возвратом в пул."""
+    if connection.closed:
+        return False
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_IDLE:
+        return True
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    try:
+        connection.rollback()
+    except Database.Error:
+        return False
+    return True
+
+
+@receiver(setting_changed)
+def close_pools_on_databases_change(setting, **kwargs):
+    if setting == 'DATABASES':
+        close_pools()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    Django закрывает соединение в конце запроса (или по CONN_MAX_AGE);
+    здесь оно возвращается в пул размером POOL_SIZE, и следующий запрос
+    любого потока получает его без нового подключения. Соединение
+    возвращается в тот пул, из которого взято; служебные соединения
+    без базы (создание и удаление тестовой базы) идут мимо пула.
+    """
+
+    creation_class = DatabaseCreation
+
+    pool = None
+
+    def get_pool(self, conn_params):
+        return get_pool(
+            self.alias,
+            conn_params,
+            self.settings_dict['POOL_SIZE'],
+            self.settings_dict['POOL_TIMEOUT'],
+            check_connection,
+            reset_connection,
+        )
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+        pool = self.get_pool(conn_params)
+        try:
+            connection = pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                )
+            )
+        except PoolTimeoutError as error:
+            raise Database.OperationalError(str(error)) from error
+        self.pool = pool
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool, self.pool = self.pool, None
+        if pool is None:
+            super()._close()
+        elif self.in_atomic_block:
+            # Обертка сохранит ссылку на соединение до конца блока,
+            # поэтому отдавать его другим потокам нельзя.
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
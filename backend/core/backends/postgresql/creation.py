@@ -0,0 +1,24 @@
+from django.db.backends.postgresql import creation
+
+from core.db_pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """CREATE и DROP DATABASE не выполняются, пока к базе есть
+    соединения, поэтому перед ними закрываем пулы псевдонима."""
+
+    def close_pools(self):
+        self.connection.close()
+        close_pools(self.connection.alias)
+
+    def _create_test_db(self, verbosity, autoclobber, keepdb=False):
+        self.close_pools()
+        return super()._create_test_db(verbosity, autoclobber, keepdb)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.close_pools()
+        return super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        self.close_pools()
+        return super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,52 @@
+from threading import Lock
+
+from django.core.cache import caches
+
+from core.conditional import bump_versions
+from core.constants import RECIPE_CARD_KEY, RECIPE_CARDS_CACHE
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = Lock()
+
+
+def get_cache():
+    return caches[RECIPE_CARDS_CACHE]
+
+
+def get_card_key(recipe_id):
+    return RECIPE_CARD_KEY.format(recipe_id=recipe_id)
+
+
+def get_recipe_cards(recipe_ids):
+    """Возвращаем закешированные карточки рецептов по их id."""
+    keys = {get_card_key(recipe_id): recipe_id for recipe_id in recipe_ids}
+    cached = get_cache().get_many(keys)
+    with _stats_lock:
+        _stats['hits'] += len(cached)
+        _stats['misses'] += len(keys) - len(cached)
+    return {keys[key]: card for key, card in cached.items()}
+
+
+def set_recipe_cards(cards):
+    get_cache().set_many(
+        {get_card_key(recipe_id): card for recipe_id, card in cards.items()}
+    )
+
+
+def invalidate_recipe_cards(recipe_ids):
+    """Сбрасываем карточки и версию ответов с рецептами."""
+    keys = [get_card_key(recipe_id) for recipe_id in recipe_ids]
+    if keys:
+        get_cache().delete_many(keys)
+        bump_versions('recipes')
+
+
+def get_recipe_cards_stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
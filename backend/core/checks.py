@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кеши, которые видит только свой процесс.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHES = ('default', 'recipe_cards')
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    """Версии данных, журнал похожих рецептов, отметки реплик и карточки
+    должны быть общими для воркеров и команд manage.py."""
+    return [
+        Error(
+            f'Кеш {alias!r} ({settings.CACHES[alias]["BACKEND"]}) '
+            'виден только своему процессу.',
+            hint='Задайте общий кеш: CACHE_BACKEND/CACHE_LOCATION и '
+                 'RECIPE_CARDS_CACHE_BACKEND/RECIPE_CARDS_CACHE_LOCATION, '
+                 'например memcached из docker-compose.',
+            id='core.E001',
+        )
+        for alias in SHARED_CACHES
+        if settings.CACHES[alias]['BACKEND'] in LOCAL_CACHE_BACKENDS
+    ]
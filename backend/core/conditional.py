@@ -0,0 +1,126 @@
+from functools import wraps
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from core.constants import CATALOG_VERSION_KEY
+from core.db_routers import pin_to_primary
+from core.subscriptions import get_subscriptions_version_key
+
+NANOSECONDS = 10 ** 9
+
+
+def get_version_key(name):
+    return CATALOG_VERSION_KEY.format(name=name)
+
+
+def set_versions(names):
+    version = time_ns()
+    cache.set_many({get_version_key(name): version for name in names}, None)
+
+
+def bump_versions(*names):
+    """Отмечаем изменение данных после фиксации транзакции.
+
+    Версия — время изменения в наносекундах.
+    """
+    transaction.on_commit(lambda: set_versions(names))
+
+
+def replicas_may_lag(versions):
+    """Изменение с такой версией могло еще не дойти до реплик."""
+    return bool(settings.DATABASE_REPLICAS) and (
+        time_ns() - max(versions)
+        < settings.REPLICA_STICKY_SECONDS * NANOSECONDS
+    )
+
+
+def get_versions(*names):
+    """Версии данных; после недавнего изменения читаем из основной базы.
+
+    Иначе ответ с новым ETag (и закешированный по новой версии)
+    мог бы собраться из еще не обновленной реплики.
+    """
+    keys = [get_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time_ns(), None)
+            versions[key] = cache.get(key)
+    versions = [versions[key] for key in keys]
+    if replicas_may_lag(versions):
+        pin_to_primary()
+    return versions
+
+
+def get_user_recipes_version_name(user_id):
+    return f'user-recipes:{user_id}'
+
+
+def bump_user_recipes_version(user_id):
+    bump_versions(get_user_recipes_version_name(user_id))
+
+
+def get_catalog_validators(*names):
+    def get_validators(request):
+        versions = get_versions(*names)
+        return '-'.join(map(str, (*names, *versions))), max(versions)
+    return get_validators
+
+
+def get_recipe_validators(request):
+    """Валидаторы ответов с рецептами.
+
+    Кроме версии рецептов ответ зависит от избранного, корзины
+    и подписок пользователя. Last-Modified отдаем только анониму:
+    версия подписок — счетчик, а не время.
+    """
+    user = request.user
+    if user.is_anonymous:
+        recipes_version, = get_versions('recipes')
+        return f'recipes-{recipes_version}', recipes_version
+    recipes_version, user_version = get_versions(
+        'recipes', get_user_recipes_version_name(user.id)
+    )
+    subscriptions_version = cache.get_or_set(
+        get_subscriptions_version_key(user.id), 0, None
+    )
+    return (
+        f'recipes-{recipes_version}-{user.id}-{user_version}-'
+        f'{subscriptions_version}',
+        None,
+    )
+
+
+def conditional(get_validators):
+    """Отвечаем 304 по ETag и Last-Modified, не вызывая сериализаторы.
+
+    get_validators(request) возвращает ETag и версию в наносекундах
+    для Last-Modified (или None).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, version = get_validators(request)
+            etag = f'"{etag}"'
+            last_modified = (
+                version // NANOSECONDS if version is not None else None
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
@@ -15,6 +15,66 @@ MAX_COOKING_TIME = 1000
 MIN_AMOUNT = 1
 MAX_AMOUNT = 50000
 MAX_LIMIT = 100
+RECIPE_KEYSET_ORDERING = ('-pub_date', 'name', 'id')
+POPULAR_RECIPE_ORDERING = ('-favorites_count', '-pub_date', 'id')
+USER_KEYSET_ORDERING = ('username', 'id')
+FEED_KEYSET_ORDERING = ('-pub_date', '-recipe_id')
+INGREDIENT_INDEX_VERSION_KEY = 'ingredient-index-version'
+SUBSCRIPTIONS_VERSION_KEY = 'subscriptions-version:{user_id}'
+SUBSCRIBED_AUTHORS_KEY = 'subscribed-authors:{user_id}:{version}'
+TAGS_MASK_BITS = 62
+IMPORT_BATCH_SIZE = 1000
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+IMAGE_RENDITION_FORMAT = 'WEBP'
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_PATH = (
+    'recipes/renditions/{image_hash}/{rendition}.{extension}'
+)
+IMAGE_HASH_LENGTH = 64
+IMAGE_ORIGINAL_PATH = 'recipes/images/{image_hash}.{extension}'
+# Формат картинки определяем по первым байтам, не декодируя ее целиком.
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': 'jpg',
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'GIF87a': 'gif',
+    b'GIF89a': 'gif',
+}
+IMAGE_SIGNATURE_CHARS = 12
+RECIPE_CARDS_CACHE = 'recipe_cards'
+RECIPE_CARD_KEY = 'recipe-card:{recipe_id}'
+RECIPE_CARD_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_TABLE = 'recipes_recipe_search'
+RECIPE_SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+METRICS_PREFIX = 'foodgram'
+TIME_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CATALOG_VERSION_KEY = 'catalog-version:{name}'
+TAGS_KEY = 'tags:{version}'
+TAGS_TIMEOUT = 60 * 60 * 24
+TOKEN_AUTH_CACHE_KEY = 'auth-token:{key_hash}'
+TOKEN_AUTH_REVOKED_KEY = 'auth-token-revoked:{key_hash}'
+PRIMARY_DB = 'default'
+PRIMARY_DB_APPS = ('authtoken', 'sessions')
+PRIMARY_PIN_KEY = 'primary-pin:{client_hash}'
+PRIMARY_PIN_COOKIE = 'primary_pin'
+SIMILAR_INDEX_MAGIC = b'FGSIM001'
+SIMILAR_CHANGES_KEY = 'similar-changes'
+SIMILAR_CHANGE_KEY = 'similar-change:{number}'
+SIMILAR_CHANGES_TIMEOUT = 60 * 60 * 24 * 7
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_TAGS_WEIGHT = 0.2
+SIMILAR_CANDIDATES = 500
+SIMILAR_POSTINGS_SHARE = 0.2
+SIMILAR_POSTINGS_MIN = 2000
+
+ASYNC_VIEW_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
 
 ARGUMENTS_FOR_ACTION_DECORATORS = {
     'post': {
@@ -22,10 +82,19 @@ ARGUMENTS_FOR_ACTION_DECORATORS = {
         'detail': True,
         'permission_classes': (IsAuthenticated,),
     },
+    'batch': {
+        'methods': ('post',),
+        'detail': False,
+        'permission_classes': (IsAuthenticated,),
+    },
     'get': {
         'detail': False,
         'permission_classes': (IsAuthenticated,),
     },
+    'similar': {
+        'methods': ('get',),
+        'detail': True,
+    },
     'del': {
         'methods': ('delete',),
         'detail': True,
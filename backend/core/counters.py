@@ -0,0 +1,20 @@
+from django.db.models import F
+
+from core.conditional import bump_versions
+from recipes.models import Cart, FavoriteRecipe, Recipe
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    Cart: 'in_carts_count',
+}
+
+
+def change_recipe_counter(model, recipe_ids, delta):
+    """Меняем счетчик популярности; от него зависит порядок
+    ordering=popular, поэтому версия рецептов тоже меняется."""
+    counter = RECIPE_COUNTERS[model]
+    if recipe_ids:
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{counter: F(counter) + delta}
+        )
+        bump_versions('recipes')
@@ -0,0 +1,163 @@
+import os
+from collections import deque
+from threading import Condition, Lock
+from time import perf_counter
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений с базой на процесс.
+
+    Не больше size соединений выдано или ждет в пуле; остальные потоки
+    ждут освобождения до timeout секунд. Перед выдачей соединение
+    из пула проверяется функцией check: разорванные (например, после
+    перезапуска базы) закрываются и заменяются новыми. Функция reset
+    готовит возвращаемое соединение к повторному использованию.
+    """
+
+    def __init__(self, size, timeout, check, reset):
+        self.size = size
+        self.timeout = timeout
+        self.check = check
+        self.reset = reset
+        self.idle = deque()
+        self.in_use = 0
+        self.closed = False
+        self.condition = Condition()
+        self.stats = {
+            'created': 0,
+            'discarded': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+        }
+
+    def can_acquire(self):
+        return bool(self.idle) or self.in_use < self.size
+
+    def acquire(self, connect):
+        started = perf_counter()
+        with self.condition:
+            if not self.can_acquire():
+                self.stats['waits'] += 1
+                ready = self.condition.wait_for(
+                    self.can_acquire, self.timeout
+                )
+                self.stats['wait_time'] += perf_counter() - started
+                if not ready:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'Нет свободных соединений за {self.timeout} с, '
+                        f'выдано {self.in_use} из {self.size}.'
+                    )
+            self.in_use += 1
+            connection = self.idle.pop() if self.idle else None
+        try:
+            if connection is not None and not self.check(connection):
+                self.close(connection)
+                connection = None
+            if connection is None:
+                connection = connect()
+                with self.condition:
+                    self.stats['created'] += 1
+        except BaseException:
+            self.discard(None)
+            raise
+        return connection
+
+    def release(self, connection):
+        if self.closed or not self.reset(connection):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.in_use -= 1
+            # Берем последним вернувшееся: оно точно живое и «теплое».
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        if connection is not None:
+            self.close(connection)
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def drain(self):
+        """Закрываем свободные соединения; выданные закроются
+        при возврате."""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = list(self.idle), deque()
+        for connection in idle:
+            self.close(connection)
+
+    def close(self, connection):
+        with self.condition:
+            self.stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                **self.stats,
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+            }
+
+
+def get_params_key(params):
+    return tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+
+def get_pool(alias, params, size, timeout, check, reset):
+    """Пул соединений текущего процесса с базой alias по параметрам params.
+
+    Ключ включает pid: воркер, созданный fork, не должен делить
+    соединения с родителем. Параметры подключения тоже входят в ключ:
+    после смены NAME (тестовая база) или хоста соединения со старой
+    базой не выдаются.
+    """
+    key = (os.getpid(), alias, get_params_key(params))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(size, timeout, check, reset)
+        return _pools[key]
+
+
+def close_pools(alias=None):
+    """Закрываем пулы процесса для alias (или все), например перед
+    созданием и удалением тестовой базы или после смены DATABASES."""
+    with _pools_lock:
+        keys = [
+            key for key in _pools if alias is None or key[1] == alias
+        ]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.drain()
+
+
+def get_pool_stats():
+    """Статистика пулов текущего процесса: alias -> счетчики."""
+    pid = os.getpid()
+    stats = {}
+    for (pool_pid, alias, _), pool in list(_pools.items()):
+        if pool_pid != pid:
+            continue
+        pool_stats = pool.get_stats()
+        if alias in stats:
+            pool_stats = {
+                field: stats[alias][field] + value
+                for field, value in pool_stats.items()
+            }
+        stats[alias] = pool_stats
+    return stats
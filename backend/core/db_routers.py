@@ -0,0 +1,114 @@
+import random
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.constants import (PRIMARY_DB, PRIMARY_DB_APPS, PRIMARY_PIN_COOKIE,
+                            PRIMARY_PIN_KEY)
+
+read_replica = ContextVar('read_replica', default=None)
+
+
+def choose_replica():
+    """Реплика выбирается один раз на запрос.
+
+    Иначе страница и ее COUNT могли бы прочитаться с разных реплик
+    с разным отставанием.
+    """
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def get_read_replica():
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return read_replica.get()
+
+
+def reads_from_replica():
+    return get_read_replica() is not None
+
+
+def pin_to_primary():
+    """До конца текущего запроса читаем из основной базы."""
+    read_replica.set(None)
+
+
+def get_pin_key(request):
+    """Ключ отметки клиента: по токену или по сессии."""
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return PRIMARY_PIN_KEY.format(
+        client_hash=sha256(credentials.encode()).hexdigest()
+    )
+
+
+def has_pin_cookie(request):
+    return request.get_signed_cookie(
+        PRIMARY_PIN_COOKIE,
+        default=None,
+        salt=PRIMARY_PIN_COOKIE,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+    ) is not None
+
+
+def is_pinned(request):
+    if has_pin_cookie(request):
+        return True
+    key = get_pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def pin_client(request, response):
+    """Клиент читает из основной базы REPLICA_STICKY_SECONDS секунд.
+
+    Отметка — подписанная cookie со временем выдачи и запись в общем
+    кеше по токену: API-клиенты часто не хранят cookie, а из кеша
+    запись может быть вытеснена раньше срока.
+    """
+    response.set_signed_cookie(
+        PRIMARY_PIN_COOKIE,
+        '1',
+        salt=PRIMARY_PIN_COOKIE,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+        httponly=True,
+        samesite='Lax',
+    )
+    key = get_pin_key(request)
+    if key is not None:
+        cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+
+
+class PrimaryReplicaRouter:
+    """Записи — в основную базу, чтения — с реплик, если можно.
+
+    С реплик читают только запросы, которым это разрешил
+    ReplicaRoutingMiddleware; команды, сигналы вне запросов и изменяющие
+    запросы работают с основной базой. Токены и сессии всегда читаются
+    из основной базы: только что выданных на реплике может еще не быть.
+    Реплики получают схему и данные репликацией, поэтому миграции
+    применяются только к основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = get_read_replica()
+        if (
+            replica is not None
+            and model._meta.app_label not in PRIMARY_DB_APPS
+        ):
+            return replica
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
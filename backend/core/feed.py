@@ -0,0 +1,150 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from recipes.models import FeedEntry, FeedPullAuthor, Recipe
+from users.models import Subscription
+
+logger = logging.getLogger(__name__)
+
+
+def get_feed_tables(connection):
+    """Имена таблиц и колонок для INSERT ... SELECT в ленты."""
+    quote = connection.ops.quote_name
+
+    def columns(model, *names):
+        return [quote(model._meta.get_field(name).column) for name in names]
+
+    return {
+        'feed': quote(FeedEntry._meta.db_table),
+        'feed_columns': ', '.join(
+            columns(FeedEntry, 'user', 'recipe', 'author', 'pub_date')
+        ),
+        'recipe': quote(Recipe._meta.db_table),
+        'subscription': quote(Subscription._meta.db_table),
+        'recipe_columns': columns(Recipe, 'id', 'author', 'pub_date'),
+        'subscription_columns': columns(Subscription, 'user', 'author'),
+    }
+
+
+def is_pull_author(author_id):
+    return FeedPullAuthor.objects.filter(author_id=author_id).exists()
+
+
+def push_recipe_to_feeds(recipe_id):
+    """Раскладываем рецепт по лентам подписчиков автора.
+
+    Один INSERT ... SELECT по подпискам автора. Если подписчиков больше
+    FEED_FANOUT_MAX_SUBSCRIBERS, автор отмечается FeedPullAuthor и его
+    рецепты читаются в ленту при чтении.
+    """
+    author_id = Recipe.objects.filter(id=recipe_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None or is_pull_author(author_id):
+        return 0
+    subscribers = Subscription.objects.filter(author_id=author_id).count()
+    if subscribers > settings.FEED_FANOUT_MAX_SUBSCRIBERS:
+        FeedPullAuthor.objects.get_or_create(author_id=author_id)
+        return 0
+    connection = connections[router.db_for_write(FeedEntry)]
+    tables = get_feed_tables(connection)
+    recipe_id_column, author_column, pub_date_column = (
+        tables['recipe_columns']
+    )
+    user_column, subscription_author_column = tables['subscription_columns']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tables["feed"]} ({tables["feed_columns"]}) '
+            f'SELECT s.{user_column}, r.{recipe_id_column}, '
+            f'r.{author_column}, r.{pub_date_column} '
+            f'FROM {tables["subscription"]} s '
+            f'JOIN {tables["recipe"]} r '
+            f'ON r.{author_column} = s.{subscription_author_column} '
+            f'WHERE r.{recipe_id_column} = %s '
+            'ON CONFLICT DO NOTHING',
+            (recipe_id,),
+        )
+        return cursor.rowcount
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляем в ленту последние FEED_BACKFILL_SIZE рецептов автора."""
+    if is_pull_author(author_id):
+        return 0
+    connection = connections[router.db_for_write(FeedEntry)]
+    tables = get_feed_tables(connection)
+    recipe_id_column, author_column, pub_date_column = (
+        tables['recipe_columns']
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tables["feed"]} ({tables["feed_columns"]}) '
+            f'SELECT %s, r.{recipe_id_column}, r.{author_column}, '
+            f'r.{pub_date_column} FROM {tables["recipe"]} r '
+            f'WHERE r.{author_column} = %s '
+            f'ORDER BY r.{pub_date_column} DESC, r.{recipe_id_column} DESC '
+            'LIMIT %s '
+            'ON CONFLICT DO NOTHING',
+            (user_id, author_id, settings.FEED_BACKFILL_SIZE),
+        )
+        return cursor.rowcount
+
+
+def trim_feed(user_id, author_id):
+    """Убираем из ленты рецепты автора, от которого отписались."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed_sources(user):
+    """Источники ленты с общей сортировкой FEED_KEYSET_ORDERING.
+
+    Записи ленты пользователя и, если он подписан на авторов
+    без раскладки, их рецепты.
+    """
+    sources = [FeedEntry.objects.filter(user=user).only(
+        'recipe_id', 'pub_date'
+    )]
+    pull_author_ids = list(Subscription.objects.filter(
+        user=user, author__feed_pull__isnull=False
+    ).values_list('author_id', flat=True))
+    if pull_author_ids:
+        sources.append(
+            Recipe.objects.filter(author_id__in=pull_author_ids).annotate(
+                recipe_id=F('id')
+            ).only('id', 'pub_date')
+        )
+    return sources
+
+
+def push_recipe_in_worker(recipe_id):
+    try:
+        return push_recipe_to_feeds(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось разложить рецепт %s по лентам', recipe_id
+        )
+    finally:
+        connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.FEED_FANOUT_WORKERS,
+        thread_name_prefix='feed-fanout',
+    )
+
+
+def schedule_feed_fanout(recipe_id):
+    """Ставим раскладку рецепта по лентам в пул после фиксации."""
+    if settings.FEED_FANOUT_SYNC:
+        transaction.on_commit(lambda: push_recipe_to_feeds(recipe_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(push_recipe_in_worker, recipe_id)
+    )
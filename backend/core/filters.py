@@ -1,5 +1,11 @@
-from django.db.models import Q
+from django.db.models import Case, IntegerField, When
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.exceptions import ValidationError
+
+from core.constants import POPULAR_RECIPE_ORDERING
+from core.ingredient_index import search_ingredients
+from core.search import search_recipes
+from core.tag_index import filter_by_tags
 
 from recipes.models import Ingredient, Recipe, Tag
 
@@ -20,9 +26,13 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
     def ingredient_name_filter(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__startswith=value) | Q(name__contains=value)
-        )
+        ids = [ingredient['id'] for ingredient in search_ingredients(value)]
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(
+            *(When(id=id, then=rank) for rank, id in enumerate(ids)),
+            output_field=IntegerField(),
+        ))
 
 
 class RecipeFilter(FilterSet):
@@ -36,12 +46,31 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='tags_filter',
+    )
+    search = filters.CharFilter(method='search_filter')
+
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='ordering_filter',
     )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_RECIPE_ORDERING)
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def tags_filter(self, queryset, name, value):
+        try:
+            return filter_by_tags(queryset, value)
+        except ValueError as error:
+            raise ValidationError({'tags': str(error)})
+
     def is_favorited_filter(self, queryset, name, value):
         return get_queryset_filter(
             queryset=queryset,
@@ -0,0 +1,191 @@
+import binascii
+import logging
+import re
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from core.cards import invalidate_recipe_cards
+from core.constants import (IMAGE_ORIGINAL_PATH, IMAGE_RENDITION_FORMAT,
+                            IMAGE_RENDITION_PATH, IMAGE_RENDITION_QUALITY,
+                            IMAGE_RENDITIONS, IMAGE_SIGNATURE_CHARS,
+                            IMAGE_SIGNATURES)
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+BASE64_PATTERN = re.compile(r'[A-Za-z0-9+/]*={0,2}')
+
+ImageUpload = namedtuple('ImageUpload', ('name', 'image_hash', 'payload'))
+
+
+def get_image_hash(payload):
+    """Хеш картинки — sha256 ее записи в base64.
+
+    Так хеш загруженной картинки считается без декодирования.
+    """
+    return sha256(payload).hexdigest()
+
+
+def read_image_upload(data):
+    """Разбираем картинку в base64 из запроса.
+
+    Картинка целиком не декодируется: формат определяем по первым
+    байтам, имя файла — по хешу. Декодирует и записывает ее пул.
+    """
+    payload = ''.join(data.split(';base64,')[-1].split())
+    if len(payload) % 4 or not BASE64_PATTERN.fullmatch(payload):
+        raise ValueError('Картинка должна быть в base64.')
+    try:
+        head = b64decode(payload[:IMAGE_SIGNATURE_CHARS])
+    except binascii.Error:
+        raise ValueError('Картинка должна быть в base64.')
+    for signature, extension in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            break
+    else:
+        raise ValueError('Неизвестный формат картинки.')
+    payload = payload.encode()
+    image_hash = get_image_hash(payload)
+    return ImageUpload(
+        IMAGE_ORIGINAL_PATH.format(
+            image_hash=image_hash, extension=extension
+        ),
+        image_hash,
+        payload,
+    )
+
+
+def get_rendition_path(image_hash, rendition):
+    return IMAGE_RENDITION_PATH.format(
+        image_hash=image_hash,
+        rendition=rendition,
+        extension=IMAGE_RENDITION_FORMAT.lower(),
+    )
+
+
+def get_rendition_urls(image_hash, request=None):
+    """Возвращаем ссылки на уменьшенные копии картинки рецепта."""
+    if not image_hash:
+        return None
+    urls = {}
+    for rendition in IMAGE_RENDITIONS:
+        url = default_storage.url(get_rendition_path(image_hash, rendition))
+        urls[rendition] = (
+            request.build_absolute_uri(url) if request is not None else url
+        )
+    return urls
+
+
+def render(image, size):
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    rendition.save(
+        buffer,
+        format=IMAGE_RENDITION_FORMAT,
+        quality=IMAGE_RENDITION_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def save_original(upload):
+    """Записываем оригинал под хешем, если такого файла еще нет."""
+    if default_storage.exists(upload.name):
+        return None
+    content = b64decode(upload.payload)
+    Image.open(BytesIO(content)).verify()
+    name = default_storage.save(upload.name, ContentFile(content))
+    if name != upload.name:
+        # Тот же файл успел записать параллельный запрос.
+        default_storage.delete(name)
+    return content
+
+
+def process_recipe_image(recipe_id, upload=None):
+    """Сохраняем оригинал картинки и строим ее уменьшенные копии.
+
+    Оригинал и копии хранятся под хешем содержимого, поэтому
+    одинаковые картинки обрабатываются и хранятся один раз.
+    Без upload картинка читается из хранилища.
+    """
+    recipe = Recipe.objects.only('id', 'image', 'image_hash').get(
+        id=recipe_id
+    )
+    if not recipe.image:
+        return None
+    if upload is None:
+        with recipe.image.open('rb') as image_file:
+            content = image_file.read()
+        image_hash = get_image_hash(b64encode(content))
+    elif recipe.image.name != upload.name:
+        # Картинку рецепта успели заменить.
+        return None
+    else:
+        content = save_original(upload)
+        image_hash = upload.image_hash
+    if image_hash == recipe.image_hash:
+        return image_hash
+    missing = [
+        rendition for rendition in IMAGE_RENDITIONS
+        if not default_storage.exists(
+            get_rendition_path(image_hash, rendition)
+        )
+    ]
+    if missing:
+        if content is None:
+            with recipe.image.open('rb') as image_file:
+                content = image_file.read()
+        image = ImageOps.exif_transpose(Image.open(BytesIO(content)))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        for rendition in missing:
+            default_storage.save(
+                get_rendition_path(image_hash, rendition),
+                ContentFile(render(image, IMAGE_RENDITIONS[rendition])),
+            )
+    Recipe.objects.filter(id=recipe_id, image=recipe.image.name).update(
+        image_hash=image_hash
+    )
+    invalidate_recipe_cards([recipe_id])
+    return image_hash
+
+
+def process_recipe_image_in_worker(recipe_id, upload=None):
+    try:
+        return process_recipe_image(recipe_id, upload)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать картинку рецепта %s', recipe_id
+        )
+    finally:
+        connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_PIPELINE_WORKERS,
+        thread_name_prefix='recipe-images',
+    )
+
+
+def schedule_recipe_image(recipe_id, upload=None):
+    """Ставим обработку картинки в пул после фиксации транзакции."""
+    if settings.IMAGE_PIPELINE_SYNC:
+        transaction.on_commit(lambda: process_recipe_image(recipe_id, upload))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(
+            process_recipe_image_in_worker, recipe_id, upload
+        )
+    )
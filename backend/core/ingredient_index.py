@@ -0,0 +1,102 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.core.cache import cache
+from django.db import DatabaseError, router
+
+from core.constants import INGREDIENT_INDEX_VERSION_KEY
+from recipes.models import Ingredient
+
+QUERY_UPPER_BOUND = '\uffff'
+
+_index = {'index': None, 'version': None}
+_index_lock = Lock()
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Индекс ингредиентов для автодополнения.
+
+    Отсортированный массив названий отвечает на префиксные запросы,
+    массив суффиксов — на поиск по подстроке. Оба ищутся бинарным
+    поиском, результаты префиксного поиска идут первыми.
+    """
+
+    def __init__(self, ingredients):
+        self.ingredients = sorted(
+            ingredients,
+            key=lambda ingredient: (
+                normalize(ingredient['name']),
+                ingredient['measurement_unit'],
+            ),
+        )
+        self.names = [
+            normalize(ingredient['name']) for ingredient in self.ingredients
+        ]
+        self.suffixes = sorted(
+            (name[start:], position)
+            for position, name in enumerate(self.names)
+            for start in range(1, len(name))
+        )
+
+    def search(self, query):
+        query = normalize(query)
+        if not query:
+            return list(self.ingredients)
+        upper_bound = query + QUERY_UPPER_BOUND
+        prefix = range(
+            bisect_left(self.names, query),
+            bisect_left(self.names, upper_bound),
+        )
+        substring = {
+            position for _, position in self.suffixes[
+                bisect_left(self.suffixes, (query,)):
+                bisect_left(self.suffixes, (upper_bound,))
+            ]
+        }.difference(prefix)
+        return (
+            [self.ingredients[position] for position in prefix]
+            + [self.ingredients[position] for position in sorted(substring)]
+        )
+
+
+def get_index_version():
+    return cache.get_or_set(INGREDIENT_INDEX_VERSION_KEY, 0, None)
+
+
+def get_ingredient_index():
+    version = get_index_version()
+    if _index['index'] is None or _index['version'] != version:
+        with _index_lock:
+            if _index['index'] is None or _index['version'] != version:
+                # Индекс живет до смены версии: строим его по основной
+                # базе, а не по реплике, которая может отставать.
+                _index['index'] = IngredientIndex(Ingredient.objects.using(
+                    router.db_for_write(Ingredient)
+                ).values('id', 'name', 'measurement_unit'))
+                _index['version'] = version
+    return _index['index']
+
+
+def is_ingredient_search(request):
+    """Запрос, на который отвечает индекс в памяти, а не база."""
+    return set(request.GET) == {'name'}
+
+
+def search_ingredients(query):
+    return get_ingredient_index().search(query)
+
+
+def invalidate_ingredient_index():
+    cache.add(INGREDIENT_INDEX_VERSION_KEY, 0, None)
+    cache.incr(INGREDIENT_INDEX_VERSION_KEY)
+
+
+def warm_ingredient_index():
+    try:
+        get_ingredient_index()
+    except DatabaseError:
+        pass
@@ -0,0 +1,210 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core.authentication import get_token_cache_stats
+from core.cards import get_recipe_cards_stats
+from core.constants import (METRICS_PREFIX, QUERY_COUNT_BUCKETS,
+                            TIME_BUCKETS)
+from core.db_pool import get_pool_stats
+
+current_request = ContextVar('current_request', default=None)
+
+DB_POOL_METRICS = (
+    ('db_pool_size', 'gauge', 'size'),
+    ('db_pool_in_use', 'gauge', 'in_use'),
+    ('db_pool_idle', 'gauge', 'idle'),
+    ('db_pool_created_total', 'counter', 'created'),
+    ('db_pool_discarded_total', 'counter', 'discarded'),
+    ('db_pool_waits_total', 'counter', 'waits'),
+    ('db_pool_wait_seconds_total', 'counter', 'wait_time'),
+    ('db_pool_timeouts_total', 'counter', 'timeouts'),
+)
+
+
+class RequestStats:
+    """Счетчики одного запроса: запросы к базе и время сериализации."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = set()
+        self.serializer_time = 0.0
+
+    @property
+    def duplicate_queries(self):
+        return self.queries - len(self.shapes)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.queries += 1
+            self.shapes.add(sql)
+
+
+def track_queries(execute, sql, params, many, context):
+    """Учитываем запрос к базе в статистике текущего HTTP-запроса.
+
+    Статистика берется из current_request, поэтому запросы считаются
+    и в потоках, куда asgiref копирует контекст.
+    """
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def add_query_tracking(connection, **kwargs):
+    # В начало списка: execute_wrapper() снимает обертки с конца.
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, track_queries)
+
+
+def instrument_connections():
+    """Подключаем track_queries ко всем соединениям с базой."""
+    connection_created.connect(add_query_tracking)
+    for connection in connections.all():
+        add_query_tracking(connection)
+
+
+class Histogram:
+
+    def __init__(self, name, description, buckets):
+        self.name = f'{METRICS_PREFIX}_{name}'
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+        self.lock = Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total = self.series.get(labels, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[labels] = (counts, total + value)
+
+    def render(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = {
+                labels: (list(counts), total)
+                for labels, (counts, total) in self.series.items()
+            }
+        for labels, (counts, total) in sorted(series.items()):
+            label_text = format_labels(labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+def format_labels(labels):
+    return ','.join(
+        f'{name}="{value}"' for name, value in zip(('view', 'method'), labels)
+    )
+
+
+HISTOGRAMS = {
+    'latency': Histogram(
+        'request_duration_seconds', 'Время ответа.', TIME_BUCKETS
+    ),
+    'db_time': Histogram(
+        'db_duration_seconds', 'Время запросов к базе.', TIME_BUCKETS
+    ),
+    'queries': Histogram(
+        'db_queries', 'Запросов к базе за ответ.', QUERY_COUNT_BUCKETS
+    ),
+    'duplicate_queries': Histogram(
+        'db_duplicate_queries',
+        'Повторов одного и того же SQL за ответ (признак N+1).',
+        QUERY_COUNT_BUCKETS,
+    ),
+    'serializer_time': Histogram(
+        'serializer_duration_seconds', 'Время сериализации.', TIME_BUCKETS
+    ),
+}
+
+
+def observe_request(view, method, stats, latency):
+    labels = (view, method)
+    HISTOGRAMS['latency'].observe(labels, latency)
+    HISTOGRAMS['db_time'].observe(labels, stats.db_time)
+    HISTOGRAMS['queries'].observe(labels, stats.queries)
+    HISTOGRAMS['duplicate_queries'].observe(
+        labels, stats.duplicate_queries
+    )
+    HISTOGRAMS['serializer_time'].observe(labels, stats.serializer_time)
+
+
+def render_cache_stats(name, stats):
+    for counter in ('hits', 'misses'):
+        metric = f'{METRICS_PREFIX}_{name}_{counter}_total'
+        yield f'# TYPE {metric} counter'
+        yield f'{metric} {stats[counter]}'
+
+
+def render_pool_stats(pools):
+    """Пулы соединений: выдано, свободно, ожидание соединения."""
+    if not pools:
+        return
+    for name, kind, field in DB_POOL_METRICS:
+        metric = f'{METRICS_PREFIX}_{name}'
+        yield f'# TYPE {metric} {kind}'
+        for alias, stats in pools.items():
+            yield f'{metric}{{alias="{alias}"}} {stats[field]}'
+
+
+def render_metrics():
+    """Отдаем метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    lines.extend(render_cache_stats('recipe_cards', get_recipe_cards_stats()))
+    lines.extend(render_cache_stats('token_cache', get_token_cache_stats()))
+    lines.extend(render_pool_stats(get_pool_stats()))
+    return '\n'.join(lines) + '\n'
+
+
+class SerializerMetricsMixin:
+    """Замеряем сериализацию во вьюсете.
+
+    Считается время обработчика без запросов к базе и рендеринг ответа:
+    в обработчиках API это в основном сборка данных сериализаторами
+    и карточками. Сериализаторы DRF при этом не меняются.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        stats = current_request.get()
+        if stats is not None:
+            self.serializer_started = perf_counter(), stats.db_time
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        stats = current_request.get()
+        started = getattr(self, 'serializer_started', None)
+        if stats is None or started is None:
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+        started, db_time = started
+        stats.serializer_time += max(
+            perf_counter() - started - (stats.db_time - db_time), 0.0
+        )
+        return response
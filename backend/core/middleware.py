@@ -0,0 +1,148 @@
+import asyncio
+from time import perf_counter
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db_routers import (choose_replica, is_pinned, pin_client,
+                             read_replica)
+from core.metrics import (RequestStats, current_request,
+                          instrument_connections, observe_request)
+
+UNMATCHED_VIEW = 'unmatched'
+
+
+def get_view_label(request):
+    """Стабильное имя обработчика запроса для метрик.
+
+    Для вьюсетов это класс и действие (RecipeViewSet.download_shopping_cart),
+    для остальных DRF-представлений — класс и HTTP-метод.
+    """
+    match = request.resolver_match
+    if match is None:
+        return UNMATCHED_VIEW
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or UNMATCHED_VIEW
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """Считаем запросы к базе, время сериализации и время ответа.
+
+    Время сериализации замеряют вьюсеты с SerializerMetricsMixin.
+    Включается настройкой REQUEST_METRICS_ENABLED, заголовок
+    Server-Timing — настройкой REQUEST_METRICS_SERVER_TIMING.
+    Работает и в синхронной, и в асинхронной цепочке обработчиков.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        instrument_connections()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        latency = perf_counter() - started
+        observe_request(
+            get_view_label(request), request.method, stats, latency
+        )
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={stats.db_time * 1000:.1f};'
+                f'desc="{stats.queries} queries, '
+                f'{stats.duplicate_queries} duplicates"',
+                f'serializer;dur={stats.serializer_time * 1000:.1f}',
+                f'total;dur={latency * 1000:.1f}',
+            ))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешаем безопасным запросам читать с реплик.
+
+    После успешного изменяющего запроса клиент (токен или сессия)
+    REPLICA_STICKY_SECONDS секунд читает из основной базы и видит свои
+    изменения, даже если реплики отстают. Отметка — подписанная cookie
+    и запись в общем кеше default.
+    Включается, если заданы DATABASE_REPLICAS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_replica.set(
+            choose_replica()
+            if request.method in SAFE_METHODS and not is_pinned(request)
+            else None
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            read_replica.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = read_replica.set(
+            choose_replica()
+            if request.method in SAFE_METHODS
+            and not await sync_to_async(
+                is_pinned, thread_sensitive=False
+            )(request)
+            else None
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(
+                self.finish, thread_sensitive=False
+            )(request, response)
+        return response
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_client(request, response)
+        return response
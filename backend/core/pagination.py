@@ -1,6 +1,18 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from core.constants import DEFAULT_LIMIT, MAX_LIMIT, MAX_PAGE_SIZE, PAGE_SIZE
+from core.constants import (DEFAULT_LIMIT, FEED_KEYSET_ORDERING, MAX_LIMIT,
+                            MAX_PAGE_SIZE, PAGE_SIZE, RECIPE_KEYSET_ORDERING,
+                            USER_KEYSET_ORDERING)
 
 
 class DefaultPagination(pagination.PageNumberPagination):
@@ -15,3 +27,167 @@ class CartPagination(pagination.LimitOffsetPagination):
     page_query_param = 'page'
     page_size_query_param = 'limit'
     max_limit = MAX_LIMIT
+
+
+class KeysetPagination(DefaultPagination):
+    """Постраничная пагинация с опциональным keyset-режимом.
+
+    Режим включается параметром ``?pagination=cursor`` или наличием
+    ``cursor`` в запросе. Курсор хранит значения полей ``ordering``
+    у граничного объекта, поэтому страницы отдаются без COUNT и OFFSET.
+    """
+
+    ordering = ()
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.is_keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if not self.is_keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(
+            [queryset], request, self.get_ordering(queryset)
+        )
+
+    def paginate_keyset(self, querysets, request, ordering):
+        """Страница по курсору из одного или нескольких источников.
+
+        Источники сортируются одинаково; из каждого берется
+        page_size + 1 строк после курсора, затем они сливаются.
+        """
+        self.request = request
+        self.ordering = ordering
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        values, self.is_reverse = (
+            self.decode_cursor(cursor) if cursor else (None, False)
+        )
+        if self.is_reverse:
+            ordering = tuple(self.reverse_field(field) for field in ordering)
+        page = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if values is not None:
+                try:
+                    queryset = queryset.filter(self.get_keyset_filter(
+                        ordering, values
+                    ))
+                except (ValidationError, ValueError, TypeError):
+                    raise NotFound(self.invalid_cursor_message)
+            page.extend(queryset[:page_size + 1])
+        if len(querysets) > 1:
+            page = self.merge(page, ordering)
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if self.is_reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.is_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(-1, False) if self.has_next else None,
+            'previous': (
+                self.get_cursor_link(0, True) if self.has_previous else None
+            ),
+            'results': data,
+        })
+
+    def get_cursor_link(self, index, reverse):
+        if not self.page:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.page[index], reverse),
+        )
+
+    def encode_cursor(self, instance, reverse):
+        values = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        payload = json.dumps(
+            {'v': values, 'r': reverse}, default=str, ensure_ascii=False
+        )
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+            values, reverse = payload['v'], bool(payload['r'])
+        except (BinasciiError, UnicodeDecodeError, ValueError, KeyError,
+                TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_ordering(self, queryset):
+        """Берем явную сортировку запроса или сортировку по умолчанию."""
+        ordering = tuple(
+            field for field in queryset.query.order_by
+            if isinstance(field, str)
+        )
+        if not ordering:
+            return type(self).ordering
+        if 'id' not in ordering and '-id' not in ordering:
+            ordering += ('id',)
+        return ordering
+
+    @staticmethod
+    def merge(rows, ordering):
+        """Сортируем строки источников, убирая повторы ключа."""
+        fields = [field.lstrip('-') for field in ordering]
+        rows = list({attrgetter(*fields)(row): row for row in rows}.values())
+        for field in reversed(ordering):
+            rows.sort(
+                key=attrgetter(field.lstrip('-')),
+                reverse=field.startswith('-'),
+            )
+        return rows
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_keyset_filter(ordering, values):
+        keyset_filter = None
+        for field, value in reversed(tuple(zip(ordering, values))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': value})
+            if keyset_filter is not None:
+                condition |= Q(**{name: value}) & keyset_filter
+            keyset_filter = condition
+        return keyset_filter
+
+
+class RecipePagination(KeysetPagination):
+    ordering = RECIPE_KEYSET_ORDERING
+
+
+class UserPagination(KeysetPagination):
+    ordering = USER_KEYSET_ORDERING
+
+
+class FeedPagination(KeysetPagination):
+    """Лента подписок листается только курсором."""
+
+    ordering = FEED_KEYSET_ORDERING
+
+    def paginate_querysets(self, querysets, request):
+        self.is_keyset = True
+        return self.paginate_keyset(querysets, request, self.ordering)
@@ -0,0 +1,152 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, router
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from core.constants import (RECIPE_SEARCH_CONFIG, RECIPE_SEARCH_TABLE,
+                            RECIPE_SEARCH_WEIGHTS)
+from core.ingredient_index import normalize
+from recipes.models import IngredientInRecipe, Recipe
+
+WORD = re.compile(r'\w+')
+MIN_STEM_LENGTH = 3
+ENDINGS = sorted(
+    (
+        'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ого', 'его',
+        'ому', 'ему', 'ыми', 'ими', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+        'ый', 'ий', 'ой', 'ей', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ую',
+        'юю', 'ов', 'ев', 'ью', 'ия', 'ь', 'а', 'я', 'о', 'е', 'ы', 'и',
+        'у', 'ю', 'й',
+    ),
+    key=len,
+    reverse=True,
+)
+
+
+def is_postgresql(connection):
+    return connection.vendor == 'postgresql'
+
+
+def get_ingredient_names():
+    return Coalesce(
+        Subquery(
+            IngredientInRecipe.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        ),
+        Value(''),
+    )
+
+
+def get_search_vector():
+    return (
+        SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(
+            get_ingredient_names(), weight='B', config=RECIPE_SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=RECIPE_SEARCH_CONFIG)
+    )
+
+
+def get_search_documents(recipe_ids):
+    documents = {
+        recipe_id: [normalize(name), [], normalize(text)]
+        for recipe_id, name, text in Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', 'name', 'text')
+    }
+    for recipe_id, name in IngredientInRecipe.objects.filter(
+        recipe_id__in=documents
+    ).values_list('recipe_id', 'ingredient__name'):
+        documents[recipe_id][1].append(normalize(name))
+    return [
+        (recipe_id, name, ' '.join(ingredients), text)
+        for recipe_id, (name, ingredients, text) in documents.items()
+    ]
+
+
+def refresh_search_index(recipe_ids):
+    """Пересчитываем поисковый индекс рецептов.
+
+    На PostgreSQL это Recipe.search_vector с GIN-индексом, на других
+    базах — таблица FTS5 с нормализованными текстами рецептов.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[router.db_for_write(Recipe)]
+    if is_postgresql(connection):
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            search_vector=get_search_vector()
+        )
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {RECIPE_SEARCH_TABLE} '
+            f'WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+        cursor.executemany(
+            f'INSERT INTO {RECIPE_SEARCH_TABLE} '
+            '(rowid, name, ingredients, text) VALUES (%s, %s, %s, %s)',
+            get_search_documents(recipe_ids),
+        )
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and (
+            len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def get_match_query(query):
+    return ' '.join(
+        f'"{stem(word)}"*' for word in WORD.findall(normalize(query))
+    )
+
+
+def search_recipes(queryset, query):
+    """Ищем рецепты по названию, описанию и ингредиентам.
+
+    Рецепты аннотируются search_rank и сортируются по нему.
+    """
+    connection = connections[queryset.db]
+    if is_postgresql(connection):
+        search_query = SearchQuery(
+            query, config=RECIPE_SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', 'id')
+    match = get_match_query(query)
+    if not match:
+        return queryset.none()
+    # Рецепты соединяются с таблицей FTS5 в самом запросе, поэтому
+    # COUNT и LIMIT/OFFSET пагинации видят все найденные рецепты,
+    # а MATCH и ранг считаются один раз.
+    recipe_id = '.'.join(
+        map(connection.ops.quote_name, (Recipe._meta.db_table, 'id'))
+    )
+    return queryset.extra(
+        tables=[RECIPE_SEARCH_TABLE],
+        where=[
+            f'{RECIPE_SEARCH_TABLE} MATCH %s',
+            f'{RECIPE_SEARCH_TABLE}.rowid = {recipe_id}',
+        ],
+        params=[match],
+    ).annotate(search_rank=RawSQL(
+        f'-bm25({RECIPE_SEARCH_TABLE}, %s, %s, %s)',
+        RECIPE_SEARCH_WEIGHTS,
+        output_field=FloatField(),
+    )).order_by('-search_rank', 'id')
@@ -1,17 +1,28 @@
 from io import BytesIO
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Exists, OuterRef
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import (BooleanField, Count, Exists, F, OuterRef,
+                              Prefetch, Value, Window)
+from django.db.models.functions import RowNumber
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from api.serializers import RecipeShortSerializer
-from api.serializers import SubscriptionSerializer
-from recipes.models import Cart, FavoriteRecipe, Recipe, IngredientInRecipe
+from api.serializers import RecipeReadSerializer, RecipeShortSerializer
+from api.serializers import SubscriptionSerializer, TagSerializer
+from core import (cards, conditional, counters, db_routers, feed,
+                  shopping_cart, similar)
+from core.constants import (MAX_LIMIT, RECIPE_CARD_FLAGS,
+                            SIMILAR_RECIPES_LIMIT, TAGS_KEY, TAGS_TIMEOUT)
+from core.pagination import FeedPagination
+from recipes.models import (Cart, FavoriteRecipe, IngredientInCart,
+                            IngredientInRecipe, Recipe, Tag)
 from users.models import Subscription
 
 User = get_user_model()
@@ -28,10 +39,18 @@ def make_subscribe(
     serializer = SubscriptionSerializer(
         author,
         data=request.data,
-        context={"request": request},
+        context={
+            "request": request,
+            "authors_recipes": get_authors_recipes(
+                author_ids=[author.id],
+                recipes_limit=get_recipes_limit(request),
+            ),
+        },
     )
     serializer.is_valid(raise_exception=True)
-    Subscription.objects.create(user=user, author=author)
+    with transaction.atomic():
+        Subscription.objects.create(user=user, author=author)
+        feed.backfill_feed(user.id, author.id)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -41,45 +60,235 @@ def unsubscribe(user, author_id):
         user=user,
         author=get_author(author_id),
     )
-    subscription.delete()
+    with transaction.atomic():
+        subscription.delete()
+        feed.trim_feed(user.id, subscription.author_id)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 def get_author_in_subscription(user):
-    return User.objects.filter(author_in_subscription__user=user)
+    return User.objects.filter(author_in_subscription__user=user).annotate(
+        recipes_count=Count('recipe_author'),
+        is_subscribed=Value(True, output_field=BooleanField()),
+    ).order_by('username')
+
+
+def get_authors_recipes(author_ids, recipes_limit=None):
+    """Возвращаем рецепты авторов одним запросом.
+
+    При заданном recipes_limit первые рецепты каждого автора
+    отбираются оконной функцией ROW_NUMBER по author_id.
+    """
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if recipes_limit is not None:
+        sql, params = recipes.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('name').asc()),
+            )
+        ).query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked_recipes '
+            'WHERE ranked_recipes.row_number <= %s '
+            'ORDER BY ranked_recipes.row_number',
+            (*params, recipes_limit),
+        )
+    authors_recipes = {author_id: [] for author_id in author_ids}
+    for recipe in recipes:
+        authors_recipes[recipe.author_id].append(recipe)
+    return authors_recipes
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.GET.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit():
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число.'}
+        )
+    return int(recipes_limit)
 
 
 def get_subscription_serializer(request, pages):
     return SubscriptionSerializer(
         pages,
         many=True,
-        context=({"request": request})
+        context=({
+            "request": request,
+            "authors_recipes": get_authors_recipes(
+                author_ids=[author.id for author in pages],
+                recipes_limit=get_recipes_limit(request),
+            ),
+        })
+    )
+
+
+def get_user_recipe_columns(model, connection):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field('recipe').column),
+    )
+
+
+def insert_user_recipes(model, user, recipe_ids):
+    """Добавляем рецепты в избранное или корзину одним запросом.
+
+    INSERT ... ON CONFLICT DO NOTHING не падает на уже добавленных
+    рецептах, RETURNING возвращает id рецептов, которые добавились.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    rows, params = [], []
+    for recipe_id in recipe_ids:
+        obj = model(user=user, recipe_id=recipe_id)
+        rows.append(f'({", ".join(["%s"] * len(fields))})')
+        params.extend(
+            field.get_db_prep_save(field.pre_save(obj, add=True), connection)
+            for field in fields
+        )
+    table, _, recipe_column = get_user_recipe_columns(model, connection)
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
     )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {", ".join(rows)} '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            params,
+        )
+        return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
+def delete_user_recipes(model, user, recipe_ids):
+    """Удаляем рецепты из избранного или корзины одним запросом.
+
+    Возвращаем id рецептов, которые действительно были удалены.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    table, user_column, recipe_column = get_user_recipe_columns(
+        model, connection
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe_column} IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            f'RETURNING {recipe_column}',
+            (user.id, *recipe_ids),
+        )
+        return {recipe_id for recipe_id, in cursor.fetchall()}
 
 
 def add_recipe_to_favorite_or_cart(model, user, id):
     recipe = get_object_or_404(Recipe, id=id)
-    if model.objects.filter(user=user, recipe=recipe).exists():
+    with transaction.atomic():
+        if model is Cart:
+            shopping_cart.lock_recipes([recipe.id])
+        added = insert_user_recipes(model, user, [recipe.id])
+        counters.change_recipe_counter(
+            model=model, recipe_ids=added, delta=1
+        )
+        if added:
+            conditional.bump_user_recipes_version(user.id)
+        if model is Cart and added:
+            shopping_cart.add_recipe_to_cart_totals(user.id, recipe.id)
+    if not added:
         return Response(
             {"errors": "Вы уже добавили этот рецепт!"},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    model.objects.create(user=user, recipe=recipe)
     serializer = RecipeShortSerializer(recipe)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 def delete_recipe_from_favorite_or_cart(model, user, id):
-    recipe_in_favorite_or_cart = model.objects.filter(
-        user=user, recipe__id=id
-    )
-    if recipe_in_favorite_or_cart.exists():
-        recipe_in_favorite_or_cart.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-    return Response(
-        {"errors": "Вы уже удалили этот рецепт!"},
-        status=status.HTTP_400_BAD_REQUEST,
+    with transaction.atomic():
+        if model is Cart:
+            shopping_cart.lock_recipes([id])
+        deleted = delete_user_recipes(model, user, [id])
+        counters.change_recipe_counter(
+            model=model, recipe_ids=deleted, delta=-1
+        )
+        if deleted:
+            conditional.bump_user_recipes_version(user.id)
+        if model is Cart and deleted:
+            shopping_cart.remove_recipes_from_cart_totals(user.id, deleted)
+    if not deleted:
+        return Response(
+            {"errors": "Вы уже удалили этот рецепт!"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def add_recipes_to_favorite_or_cart(model, user, recipe_ids):
+    """Добавляем несколько рецептов в избранное или корзину.
+
+    Рецепты проверяются одним запросом и добавляются одним INSERT,
+    в ответе статус по каждому переданному id.
+    """
+    found = set(
+        Recipe.objects.filter(id__in=recipe_ids).values_list('id', flat=True)
     )
+    with transaction.atomic():
+        if model is Cart:
+            shopping_cart.lock_recipes(found)
+        added = insert_user_recipes(
+            model, user,
+            [recipe_id for recipe_id in recipe_ids if recipe_id in found],
+        )
+        counters.change_recipe_counter(
+            model=model, recipe_ids=added, delta=1
+        )
+        if added:
+            conditional.bump_user_recipes_version(user.id)
+        if model is Cart and added:
+            shopping_cart.add_recipes_to_cart_totals(user.id, added)
+    return Response({'recipes': [
+        {
+            'id': recipe_id,
+            'status': (
+                'added' if recipe_id in added
+                else 'already_added' if recipe_id in found
+                else 'not_found'
+            ),
+        }
+        for recipe_id in recipe_ids
+    ]})
+
+
+def delete_recipes_from_favorite_or_cart(model, user, recipe_ids):
+    """Удаляем несколько рецептов из избранного или корзины одним DELETE."""
+    with transaction.atomic():
+        if model is Cart:
+            shopping_cart.lock_recipes(recipe_ids)
+        deleted = delete_user_recipes(model, user, recipe_ids)
+        counters.change_recipe_counter(
+            model=model, recipe_ids=deleted, delta=-1
+        )
+        if deleted:
+            conditional.bump_user_recipes_version(user.id)
+        if model is Cart and deleted:
+            shopping_cart.remove_recipes_from_cart_totals(user.id, deleted)
+    return Response({'recipes': [
+        {
+            'id': recipe_id,
+            'status': 'deleted' if recipe_id in deleted else 'not_added',
+        }
+        for recipe_id in recipe_ids
+    ]})
 
 
 def cart_text(user, ingredients, date):
@@ -99,13 +308,12 @@ def cart_text(user, ingredients, date):
 
 
 def create_and_download_shopping_cart(user):
-    ingredients = IngredientInRecipe.objects.filter(
-        recipe__shopping_cart__user=user
+    ingredients = IngredientInCart.objects.filter(
+        user=user, amount__gt=0
     ).values(
         'ingredient__name',
-        'ingredient__measurement_unit'
-    ).annotate(
-        in_shopping_cart_ingredient_amount=Sum('amount')
+        'ingredient__measurement_unit',
+        in_shopping_cart_ingredient_amount=F('amount'),
     ).order_by('ingredient__name')
     shopping_list_date = timezone.now()
     html = cart_text(
@@ -119,8 +327,37 @@ def create_and_download_shopping_cart(user):
     )
 
 
+def get_tags():
+    """Список тегов из кэша: ключ меняется вместе с версией тегов."""
+    version, = conditional.get_versions('tags')
+    return cache.get_or_set(
+        TAGS_KEY.format(version=version),
+        lambda: TagSerializer(Tag.objects.all(), many=True).data,
+        TAGS_TIMEOUT,
+    )
+
+
+def get_recipes_for_read():
+    return Recipe.objects.defer('search_vector').select_related(
+        'author'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredientinrecipe_set',
+            queryset=IngredientInRecipe.objects.select_related(
+                'ingredient'
+            ).order_by('ingredient__name'),
+        ),
+    )
+
+
 def get_flags(request):
-    recipes = Recipe.objects.all()
+    recipes = Recipe.objects.defer('search_vector')
+    if request.user.is_anonymous:
+        return recipes.annotate(
+            is_favorited=Value(False, output_field=BooleanField()),
+            is_in_shopping_cart=Value(False, output_field=BooleanField()),
+        )
     return recipes.annotate(
         is_favorited=Exists(
             FavoriteRecipe.objects.filter(recipe_id=OuterRef('id'),
@@ -131,3 +368,96 @@ def get_flags(request):
                                 user=request.user)
         )
     )
+
+
+def get_feed(request):
+    """Лента рецептов авторов, на которых подписан пользователь."""
+    paginator = FeedPagination()
+    entries = paginator.paginate_querysets(
+        feed.get_feed_sources(request.user), request
+    )
+    recipes = get_flags(request).in_bulk(
+        [entry.recipe_id for entry in entries]
+    )
+    return paginator.get_paginated_response(get_recipe_cards(
+        request=request,
+        recipes=[
+            recipes[entry.recipe_id] for entry in entries
+            if entry.recipe_id in recipes
+        ],
+    ))
+
+
+def get_similar_limit(request):
+    limit = request.GET.get('limit')
+    if not limit:
+        return SIMILAR_RECIPES_LIMIT
+    if not limit.isdigit() or not 0 < int(limit) <= MAX_LIMIT:
+        raise ValidationError(
+            {'limit': f'Укажите число от 1 до {MAX_LIMIT}.'}
+        )
+    return int(limit)
+
+
+def get_similar_recipes(request, recipe):
+    """Рецепты, похожие на recipe по ингредиентам и тегам."""
+    recipe_ids = similar.get_similar_recipe_ids(
+        recipe.id, get_similar_limit(request)
+    )
+    recipes = get_flags(request).in_bulk(recipe_ids)
+    return Response(get_recipe_cards(
+        request=request,
+        recipes=[
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ],
+    ))
+
+
+def render_recipe_card(recipe):
+    card = RecipeReadSerializer(recipe).data
+    for flag in RECIPE_CARD_FLAGS:
+        card.pop(flag)
+    return dict(card)
+
+
+def get_recipe_cards(request, recipes):
+    recipe_cards = cards.get_recipe_cards(recipe.id for recipe in recipes)
+    missing = [
+        recipe.id for recipe in recipes if recipe.id not in recipe_cards
+    ]
+    if missing:
+        rendered = {
+            recipe.id: render_recipe_card(recipe)
+            for recipe in get_recipes_for_read().filter(id__in=missing)
+        }
+        # Карточки, прочитанные с отстающей реплики, не кешируем.
+        if not (
+            db_routers.reads_from_replica()
+            and conditional.replicas_may_lag(
+                conditional.get_versions('recipes')
+            )
+        ):
+            cards.set_recipe_cards(rendered)
+        recipe_cards.update(rendered)
+    return [
+        merge_recipe_card(request, recipe, recipe_cards[recipe.id])
+        for recipe in recipes
+    ]
+
+
+def merge_recipe_card(request, recipe, card):
+    representation = {}
+    for field in RecipeReadSerializer.Meta.fields:
+        if field in RECIPE_CARD_FLAGS:
+            representation[field] = getattr(recipe, field, False)
+        elif field == 'image' and card[field]:
+            representation[field] = request.build_absolute_uri(card[field])
+        elif field == 'images' and card[field]:
+            representation[field] = {
+                rendition: request.build_absolute_uri(url)
+                for rendition, url in card[field].items()
+            }
+        else:
+            representation[field] = card[field]
+    return representation
@@ -0,0 +1,133 @@
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import F, Sum
+
+from recipes.models import Cart, IngredientInCart, IngredientInRecipe, Recipe
+
+
+def get_recipe_amounts(recipe_id):
+    return get_recipes_amounts([recipe_id])
+
+
+def get_recipes_amounts(recipe_ids):
+    """Суммируем количества ингредиентов нескольких рецептов."""
+    amounts = Counter()
+    for ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def lock_recipes(recipe_ids):
+    """Блокируем рецепты до конца транзакции.
+
+    Изменения корзины и ингредиентов одного рецепта так идут по очереди.
+    Иначе правка ингредиентов не увидит строку корзины, добавленную
+    параллельно, а добавление — новые количества, и разница потеряется.
+    SQLite блокирует базу на запись целиком, там блокировка не нужна.
+    """
+    connection = transaction.get_connection(router.db_for_write(Recipe))
+    if (
+        connection.in_atomic_block
+        and connection.features.has_select_for_update
+    ):
+        list(Recipe.objects.select_for_update().filter(
+            id__in=recipe_ids
+        ).order_by('id').values_list('id', flat=True))
+
+
+def apply_cart_totals_delta(user_ids, deltas):
+    """Добавляем к суммам ингредиентов пользователей изменения deltas.
+
+    Суммы не обрезаются нулем: отрицательная сумма — признак
+    расхождения, его показывает rebuild_cart_totals --verify.
+    """
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic():
+        IngredientInCart.objects.bulk_create(
+            [
+                IngredientInCart(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        for ingredient_id, delta in deltas.items():
+            IngredientInCart.objects.filter(
+                user_id__in=user_ids, ingredient_id=ingredient_id
+            ).update(amount=F('amount') + delta)
+        IngredientInCart.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas, amount=0
+        ).delete()
+
+
+def add_recipe_to_cart_totals(user_id, recipe_id):
+    add_recipes_to_cart_totals(user_id, [recipe_id])
+
+
+def add_recipes_to_cart_totals(user_id, recipe_ids):
+    apply_cart_totals_delta([user_id], get_recipes_amounts(recipe_ids))
+
+
+def remove_recipe_from_cart_totals(user_id, recipe_id):
+    remove_recipes_from_cart_totals(user_id, [recipe_id])
+
+
+def remove_recipes_from_cart_totals(user_id, recipe_ids):
+    amounts = get_recipes_amounts(recipe_ids)
+    apply_cart_totals_delta(
+        [user_id],
+        {ingredient_id: -amount for ingredient_id, amount in amounts.items()},
+    )
+
+
+def update_recipe_in_cart_totals(recipe_id, old_amounts, new_amounts):
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_cart_totals_delta(
+        Cart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        ),
+        deltas,
+    )
+
+
+def get_live_cart_totals():
+    return {
+        (row['recipe__shopping_cart__user'], row['ingredient']): row['total']
+        for row in IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+def get_stored_cart_totals():
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in
+        IngredientInCart.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ).order_by()
+    }
+
+
+def rebuild_cart_totals():
+    with transaction.atomic():
+        IngredientInCart.objects.all().delete()
+        IngredientInCart.objects.bulk_create(
+            IngredientInCart(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for (user_id, ingredient_id), amount in
+            get_live_cart_totals().items()
+        )
@@ -0,0 +1,256 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_tokens
+from core.cards import invalidate_recipe_cards
+from core.conditional import bump_user_recipes_version, bump_versions
+from core.counters import change_recipe_counter
+from core.ingredient_index import invalidate_ingredient_index
+from core.search import refresh_search_index
+from core.shopping_cart import (add_recipe_to_cart_totals, lock_recipes,
+                                remove_recipe_from_cart_totals,
+                                update_recipe_in_cart_totals)
+from core.similar import mark_recipes_changed
+from core.subscriptions import bump_subscriptions_version
+from core.tag_index import refresh_tags_mask
+
+from recipes.models import (Cart, FavoriteRecipe, Ingredient,
+                            IngredientInRecipe, Recipe, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+AUTHOR_CARD_FIELDS = frozenset(
+    ('email', 'username', 'first_name', 'last_name')
+)
+LOGIN_FIELDS = frozenset(('last_login',))
+
+ingredients_handled = ContextVar('ingredients_handled', default=False)
+
+
+@contextmanager
+def recipe_ingredients_handled():
+    """Изменения ингредиентов рецепта учитывает вызывающий код.
+
+    WriteRecipeSerializer сам пересчитывает корзины, поиск, карточки
+    и похожие рецепты один раз на рецепт, поэтому построчные
+    обработчики IngredientInRecipe внутри блока ничего не делают.
+    """
+    token = ingredients_handled.set(True)
+    try:
+        yield
+    finally:
+        ingredients_handled.reset(token)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipe_cards([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    if not ingredients_handled.get():
+        invalidate_recipe_cards([instance.recipe_id])
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def refresh_recipe_search(sender, instance, **kwargs):
+    refresh_search_index([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def refresh_recipe_ingredients_search(sender, instance, **kwargs):
+    if not ingredients_handled.get():
+        refresh_search_index([instance.recipe_id])
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def refresh_similar_recipes(sender, instance, **kwargs):
+    mark_recipes_changed([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def refresh_similar_recipe_ingredients(sender, instance, **kwargs):
+    if not ingredients_handled.get():
+        mark_recipes_changed([instance.recipe_id])
+
+
+@receiver((pre_save, pre_delete), sender=IngredientInRecipe)
+@receiver((pre_save, pre_delete), sender=Cart)
+def lock_cart_recipe(sender, instance, **kwargs):
+    """Правки мимо сервисов и сериализатора тоже ждут блокировку
+    рецепта, см. lock_recipes."""
+    if not ingredients_handled.get():
+        lock_recipes([instance.recipe_id])
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_ingredient_amount(sender, instance, **kwargs):
+    instance.previous_amount = (
+        IngredientInRecipe.objects.filter(pk=instance.pk).values_list(
+            'recipe_id', 'ingredient_id', 'amount'
+        ).first() if instance.pk is not None else None
+    )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def update_cart_totals(sender, instance, **kwargs):
+    """Правки ингредиентов мимо сериализатора (админка, shell)
+    тоже меняют суммы в корзинах."""
+    if ingredients_handled.get():
+        return
+    old_amounts = {}
+    previous = getattr(instance, 'previous_amount', None)
+    if previous is not None:
+        recipe_id, ingredient_id, amount = previous
+        if recipe_id == instance.recipe_id:
+            old_amounts = {ingredient_id: amount}
+        else:
+            update_recipe_in_cart_totals(
+                recipe_id, {ingredient_id: amount}, {}
+            )
+    update_recipe_in_cart_totals(
+        instance.recipe_id,
+        old_amounts,
+        {instance.ingredient_id: instance.amount},
+    )
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def remove_ingredient_from_cart_totals(sender, instance, **kwargs):
+    if not ingredients_handled.get():
+        update_recipe_in_cart_totals(
+            instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_index(
+            instance.ingredients_in_recipe.values_list('id', flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_recipe_tags(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance.cleared_recipe_ids = list(
+            instance.recipe_tags.values_list('id', flat=True)
+        )
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.id]
+    else:
+        recipe_ids = pk_set or getattr(instance, 'cleared_recipe_ids', ())
+    refresh_tags_mask(recipe_ids)
+    invalidate_recipe_cards(recipe_ids)
+    mark_recipes_changed(recipe_ids)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    instance.tagged_recipe_ids = list(
+        instance.recipe_tags.values_list('id', flat=True)
+    )
+    invalidate_recipe_cards(instance.tagged_recipe_ids)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_versions('tags')
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_deleted_tag(sender, instance, **kwargs):
+    refresh_tags_mask(getattr(instance, 'tagged_recipe_ids', ()))
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def invalidate_ingredient(sender, instance, **kwargs):
+    invalidate_recipe_cards(
+        instance.ingredients_in_recipe.values_list('id', flat=True)
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_search(sender, **kwargs):
+    transaction.on_commit(invalidate_ingredient_index)
+    bump_versions('ingredients')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields and AUTHOR_CARD_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    invalidate_recipe_cards(
+        instance.recipe_author.values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields,
+                           **kwargs):
+    if created or (update_fields and LOGIN_FIELDS.issuperset(update_fields)):
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_subscriptions(sender, instance, **kwargs):
+    bump_subscriptions_version(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=Cart)
+def bump_user_recipes(sender, instance, **kwargs):
+    bump_user_recipes_version(instance.user_id)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=Cart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    """Счетчики для записей мимо сервисов: админка, shell, каскадное
+    удаление пользователя. Сервисы пишут строки SQL-запросом и сами
+    меняют счетчики, сигналы при этом не вызываются."""
+    if created:
+        change_recipe_counter(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=Cart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    change_recipe_counter(sender, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Cart)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_cart_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=Cart)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    """После удаления: при удалении рецепта его строки ингредиентов
+    могут удалиться и раньше, и позже строк корзины, и вычесть их
+    нужно ровно один раз."""
+    remove_recipe_from_cart_totals(instance.user_id, instance.recipe_id)
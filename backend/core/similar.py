@@ -0,0 +1,494 @@
+import heapq
+import logging
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from math import log
+from mmap import ACCESS_READ, mmap
+from operator import itemgetter
+from threading import Lock
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.constants import (SIMILAR_CANDIDATES, SIMILAR_CHANGE_KEY,
+                            SIMILAR_CHANGES_KEY, SIMILAR_CHANGES_TIMEOUT,
+                            SIMILAR_INDEX_MAGIC, SIMILAR_POSTINGS_MIN,
+                            SIMILAR_POSTINGS_SHARE, SIMILAR_TAGS_WEIGHT)
+from recipes.models import IngredientInRecipe, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Заголовок: метка формата, число рецептов, ингредиентов и пар
+# рецепт-ингредиент, номер последнего учтенного изменения, время сборки.
+HEADER = struct.Struct('<8sQQQQd')
+ALIGNMENT = 8
+
+_index = {'index': None, 'overlay': None, 'key': None}
+_index_lock = Lock()
+
+
+class SimilarIndexUnavailableError(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Индекс похожих рецептов еще не построен.'
+    default_code = 'similar_index_unavailable'
+
+
+def get_sections(recipes, ingredients, entries):
+    """Массивы файла индекса по порядку: имя, тип элемента, длина.
+
+    Прямой индекс (forward) хранит номера ингредиентов каждого рецепта,
+    обратный (postings) — номера рецептов каждого ингредиента; границы
+    списков лежат в массивах *_offsets.
+    """
+    return (
+        ('recipe_ids', 'Q', recipes),
+        ('masks', 'q', recipes),
+        ('norms', 'd', recipes),
+        ('forward_offsets', 'I', recipes + 1),
+        ('forward', 'I', entries),
+        ('ingredient_ids', 'Q', ingredients),
+        ('weights', 'd', ingredients),
+        ('posting_offsets', 'I', ingredients + 1),
+        ('postings', 'I', entries),
+    )
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def get_weight(recipes, frequency):
+    """IDF ингредиента: соль почти ничего не говорит о сходстве."""
+    return log(1 + recipes / frequency)
+
+
+def count_bits(value):
+    return bin(value).count('1')
+
+
+def get_score(common, norm, other_norm, mask, other_mask):
+    """Взвешенный Жаккар по ингредиентам с добавкой Жаккара по тегам."""
+    union = norm + other_norm - common
+    tags_union = mask | other_mask
+    return (
+        (1 - SIMILAR_TAGS_WEIGHT) * (common / union if union else 0.0)
+        + SIMILAR_TAGS_WEIGHT * (
+            count_bits(mask & other_mask) / count_bits(tags_union)
+            if tags_union else 0.0
+        )
+    )
+
+
+def get_recipe_vectors(recipe_ids=None):
+    """Ингредиенты и маска тегов рецептов: id -> (ingredient_ids, mask).
+
+    Читаем основную базу: изменения только что зафиксированы, и реплика
+    может их еще не получить.
+    """
+    database = router.db_for_write(Recipe)
+    recipes = Recipe.objects.using(database)
+    rows = IngredientInRecipe.objects.using(database)
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in rows.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        ingredients[recipe_id].append(ingredient_id)
+    return {
+        recipe_id: (tuple(ingredients.get(recipe_id, ())), mask)
+        for recipe_id, mask in recipes.values_list(
+            'id', 'tags_mask'
+        ).iterator()
+    }
+
+
+def write_similar_index(path, vectors, changes):
+    """Записываем индекс рецептов vectors в файл path.
+
+    vectors — пары (recipe_id, (ingredient_ids, tags_mask)). Файл пишется
+    рядом и подменяется целиком, поэтому воркеры, которые держат старый
+    файл в памяти, дочитывают его без ошибок.
+    """
+    vectors = sorted(vectors, key=itemgetter(0))
+    frequencies = Counter(
+        ingredient_id
+        for _, (ingredient_ids, _) in vectors
+        for ingredient_id in set(ingredient_ids)
+    )
+    ingredient_ids = sorted(frequencies)
+    ingredient_slots = {
+        ingredient_id: slot for slot, ingredient_id in enumerate(
+            ingredient_ids
+        )
+    }
+    data = {name: array(code) for name, code, _ in get_sections(0, 0, 0)}
+    data['ingredient_ids'].extend(ingredient_ids)
+    data['weights'].extend(
+        get_weight(len(vectors), frequencies[ingredient_id])
+        for ingredient_id in ingredient_ids
+    )
+    data['forward_offsets'].append(0)
+    postings = [array('I') for _ in ingredient_ids]
+    for slot, (recipe_id, (recipe_ingredient_ids, mask)) in enumerate(
+        vectors
+    ):
+        slots = sorted({
+            ingredient_slots[ingredient_id]
+            for ingredient_id in recipe_ingredient_ids
+        })
+        data['recipe_ids'].append(recipe_id)
+        data['masks'].append(mask)
+        data['norms'].append(sum(data['weights'][slot] for slot in slots))
+        data['forward'].extend(slots)
+        data['forward_offsets'].append(len(data['forward']))
+        for ingredient_slot in slots:
+            postings[ingredient_slot].append(slot)
+    data['posting_offsets'].append(0)
+    for ingredient_postings in postings:
+        data['postings'].extend(ingredient_postings)
+        data['posting_offsets'].append(len(data['postings']))
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(HEADER.pack(
+            SIMILAR_INDEX_MAGIC, len(vectors), len(ingredient_ids),
+            len(data['forward']), changes, time(),
+        ))
+        for name, _, _ in get_sections(0, 0, 0):
+            file.write(bytes(align(file.tell()) - file.tell()))
+            data[name].tofile(file)
+    os.replace(temporary_path, path)
+
+
+def build_similar_index(path=None):
+    """Полная пересборка индекса по базе.
+
+    Номер изменений берем до чтения базы: изменения, зафиксированные
+    во время сборки, воркеры применят поверх нового индекса. Возвращаем
+    число рецептов в индексе.
+    """
+    cache.add(SIMILAR_CHANGES_KEY, 0, None)
+    changes = cache.get(SIMILAR_CHANGES_KEY, 0)
+    vectors = get_recipe_vectors()
+    write_similar_index(
+        path or settings.SIMILAR_INDEX_PATH, vectors.items(), changes
+    )
+    return len(vectors)
+
+
+class SimilarIndex:
+    """Индекс похожих рецептов, отображенный в память.
+
+    Массивы читаются прямо из файла без разбора, поэтому воркеры
+    открывают индекс мгновенно и делят его страницы через кэш ОС.
+    Кандидаты набираются по спискам самых редких ингредиентов рецепта
+    в пределах бюджета postings_budget, лучшие SIMILAR_CANDIDATES из них
+    оцениваются точно с учетом частых ингредиентов и тегов.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.buffer = mmap(file.fileno(), 0, access=ACCESS_READ)
+        self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        view = memoryview(self.buffer)
+        (
+            magic, recipes, ingredients, entries, self.changes,
+            self.built_at,
+        ) = HEADER.unpack_from(view)
+        if magic != SIMILAR_INDEX_MAGIC:
+            raise ValueError(f'{path} не является индексом похожих рецептов.')
+        offset = HEADER.size
+        for name, code, length in get_sections(recipes, ingredients, entries):
+            offset = align(offset)
+            size = length * array(code).itemsize
+            setattr(self, name, view[offset:offset + size].cast(code))
+            offset += size
+        self.postings_budget = max(
+            SIMILAR_POSTINGS_MIN, int(recipes * SIMILAR_POSTINGS_SHARE)
+        )
+        # Ингредиент, которого не было при сборке, считаем самым редким.
+        self.max_weight = max(self.weights, default=1.0)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def find_slot(self, ids, value):
+        slot = bisect_left(ids, value)
+        if slot < len(ids) and ids[slot] == value:
+            return slot
+        return None
+
+    def get_weight(self, ingredient_id):
+        slot = self.find_slot(self.ingredient_ids, ingredient_id)
+        if slot is None:
+            return self.max_weight
+        return self.weights[slot]
+
+    def get_vector(self, slot):
+        return (
+            tuple(
+                self.ingredient_ids[ingredient_slot]
+                for ingredient_slot in self.forward[
+                    self.forward_offsets[slot]:self.forward_offsets[slot + 1]
+                ]
+            ),
+            self.masks[slot],
+        )
+
+    def get_postings(self, slot):
+        return self.postings[
+            self.posting_offsets[slot]:self.posting_offsets[slot + 1]
+        ]
+
+    def get_candidate_slots(self, weights):
+        """Ингредиенты для набора кандидатов: от редких, пока хватает
+        бюджета, но хотя бы один."""
+        slots = []
+        budget = self.postings_budget
+        for slot in sorted(weights, key=lambda slot: len(
+            self.get_postings(slot)
+        )):
+            budget -= len(self.get_postings(slot))
+            if slots and budget < 0:
+                break
+            slots.append(slot)
+        return slots
+
+    def find(self, ingredient_ids, mask, norm, skip, exact=False):
+        """Похожие рецепты индекса: [(score, recipe_id)].
+
+        skip — номера рецептов, которые не возвращаем. При exact
+        оцениваются все рецепты с общими ингредиентами: так
+        benchmark_similar проверяет точность быстрого поиска.
+        """
+        weights = {}
+        for ingredient_id in ingredient_ids:
+            slot = self.find_slot(self.ingredient_ids, ingredient_id)
+            if slot is not None:
+                weights[slot] = self.weights[slot]
+        overlap = {}
+        get_overlap = overlap.get
+        for slot in (weights if exact else self.get_candidate_slots(weights)):
+            weight = weights[slot]
+            for recipe in self.get_postings(slot):
+                overlap[recipe] = get_overlap(recipe, 0.0) + weight
+        for recipe in skip:
+            overlap.pop(recipe, None)
+        norms = self.norms
+        found = []
+        # Кандидатов упорядочиваем по Жаккару по найденной части
+        # пересечения: по самому пересечению выигрывали бы длинные рецепты.
+        for recipe in (overlap if exact else heapq.nlargest(
+            SIMILAR_CANDIDATES, overlap, key=lambda recipe: (
+                overlap[recipe] / (norm + norms[recipe] - overlap[recipe])
+            )
+        )):
+            common = sum(
+                weights.get(slot, 0.0) for slot in self.forward[
+                    self.forward_offsets[recipe]:
+                    self.forward_offsets[recipe + 1]
+                ]
+            )
+            found.append((
+                get_score(
+                    common, norm, norms[recipe], mask, self.masks[recipe]
+                ),
+                self.recipe_ids[recipe],
+            ))
+        return found
+
+
+class SimilarOverlay:
+    """Рецепты, созданные, измененные или удаленные после сборки индекса.
+
+    Файл индекса между пересборками не меняется: такие рецепты читаются
+    из базы и сравниваются здесь перебором, а их записи в индексе
+    (slots) пропускаются. Удаленные рецепты хранятся как None.
+    Изменения применяются на месте: поиск в других потоках может
+    увидеть рецепт до или после изменения, но не копию всего слоя.
+    """
+
+    def __init__(self, index, changes, recipes=None):
+        self.index = index
+        self.changes = changes
+        self.recipes = {}
+        self.slots = set()
+        self.norms = {}
+        self.postings = defaultdict(set)
+        self.lock = Lock()
+        self.update(recipes or {})
+
+    def apply(self, changes, vectors):
+        """Применяем изменения до номера changes, если их еще нет."""
+        with self.lock:
+            if changes <= self.changes:
+                return
+            self.update(vectors)
+            self.changes = changes
+
+    def update(self, vectors):
+        for recipe_id, vector in vectors.items():
+            previous = self.recipes.get(recipe_id)
+            if previous is not None:
+                for ingredient_id in set(previous[0]) - set(
+                    vector[0] if vector is not None else ()
+                ):
+                    self.postings[ingredient_id].discard(recipe_id)
+            slot = self.index.find_slot(self.index.recipe_ids, recipe_id)
+            if slot is not None:
+                self.slots.add(slot)
+            if vector is None:
+                self.recipes[recipe_id] = None
+                self.norms.pop(recipe_id, None)
+                continue
+            self.norms[recipe_id] = sum(
+                map(self.index.get_weight, vector[0])
+            )
+            self.recipes[recipe_id] = vector
+            for ingredient_id in vector[0]:
+                self.postings[ingredient_id].add(recipe_id)
+
+    def find(self, ingredient_ids, mask, norm, skip):
+        weights = {
+            ingredient_id: self.index.get_weight(ingredient_id)
+            for ingredient_id in ingredient_ids
+        }
+        candidates = set().union(*(
+            self.postings.get(ingredient_id, ()) for ingredient_id in weights
+        ))
+        candidates.discard(skip)
+        found = []
+        for recipe_id in candidates:
+            vector = self.recipes.get(recipe_id)
+            other_norm = self.norms.get(recipe_id)
+            if vector is None or other_norm is None:
+                # Рецепт удалили, пока шел поиск.
+                continue
+            other_ingredient_ids, other_mask = vector
+            found.append((
+                get_score(
+                    sum(
+                        weights.get(ingredient_id, 0.0)
+                        for ingredient_id in other_ingredient_ids
+                    ),
+                    norm,
+                    other_norm,
+                    mask,
+                    other_mask,
+                ),
+                recipe_id,
+            ))
+        return found
+
+
+def mark_recipes_changed(recipe_ids):
+    """Записываем изменение рецептов в журнал после фиксации.
+
+    Журнал — счетчик SIMILAR_CHANGES_KEY и по ключу на каждый номер;
+    воркеры дочитывают его с номера, учтенного в их индексе.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    def mark():
+        cache.add(SIMILAR_CHANGES_KEY, 0, None)
+        number = cache.incr(SIMILAR_CHANGES_KEY)
+        cache.set(
+            SIMILAR_CHANGE_KEY.format(number=number),
+            recipe_ids,
+            SIMILAR_CHANGES_TIMEOUT,
+        )
+
+    transaction.on_commit(mark)
+
+
+def get_changes(seen):
+    """Номер последнего прочитанного изменения и id измененных рецептов.
+
+    Записи, которые еще не успели положить в кэш, дочитаем в следующий
+    раз; пропавшие из кэша восстановит только пересборка индекса.
+    """
+    current = cache.get(SIMILAR_CHANGES_KEY, 0)
+    if current <= seen:
+        return seen, set()
+    keys = {
+        SIMILAR_CHANGE_KEY.format(number=number): number
+        for number in range(seen + 1, current + 1)
+    }
+    batches = cache.get_many(keys)
+    if not batches:
+        return seen, set()
+    last = max(keys[key] for key in batches)
+    if len(batches) < last - seen:
+        logger.warning(
+            'Журнал изменений похожих рецептов неполон: пересоберите '
+            'индекс командой build_similar_index.'
+        )
+    return last, {
+        recipe_id for recipe_ids in batches.values()
+        for recipe_id in recipe_ids
+    }
+
+
+def get_similar_index():
+    """Индекс текущего файла и изменения поверх него.
+
+    Новый файл после пересборки подхватывается по смене inode или
+    времени записи. Журнал и рецепты читаются без блокировки, чтобы
+    потоки не ждали друг друга на запросах к кешу и базе.
+    """
+    path = settings.SIMILAR_INDEX_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise SimilarIndexUnavailableError()
+    with _index_lock:
+        if _index['key'] != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            index = SimilarIndex(path)
+            _index.update(
+                index=index,
+                overlay=SimilarOverlay(index, index.changes),
+                key=index.key,
+            )
+        index, overlay = _index['index'], _index['overlay']
+    changes, recipe_ids = get_changes(overlay.changes)
+    if changes != overlay.changes:
+        vectors = get_recipe_vectors(recipe_ids)
+        overlay.apply(changes, {
+            recipe_id: vectors.get(recipe_id) for recipe_id in recipe_ids
+        })
+    return index, overlay
+
+
+def find_similar(index, overlay, recipe_id, limit, exact=False):
+    """Id рецептов, похожих на recipe_id, от самого похожего."""
+    slot = index.find_slot(index.recipe_ids, recipe_id)
+    if recipe_id in overlay.recipes:
+        vector = overlay.recipes[recipe_id]
+    elif slot is not None:
+        vector = index.get_vector(slot)
+    else:
+        vector = get_recipe_vectors([recipe_id]).get(recipe_id)
+    if vector is None:
+        return []
+    ingredient_ids, mask = vector
+    norm = sum(map(index.get_weight, set(ingredient_ids)))
+    skip = overlay.slots if slot is None else overlay.slots | {slot}
+    found = index.find(
+        ingredient_ids, mask, norm, skip, exact
+    ) + overlay.find(ingredient_ids, mask, norm, recipe_id)
+    return [recipe_id for _, recipe_id in heapq.nlargest(limit, found)]
+
+
+def get_similar_recipe_ids(recipe_id, limit):
+    return find_similar(*get_similar_index(), recipe_id, limit)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from core.constants import (SUBSCRIBED_AUTHORS_KEY,
+                            SUBSCRIPTIONS_VERSION_KEY)
+from users.models import Subscription
+
+
+def get_subscriptions_version_key(user_id):
+    return SUBSCRIPTIONS_VERSION_KEY.format(user_id=user_id)
+
+
+def get_subscribed_author_ids(request):
+    """Возвращаем id авторов, на которых подписан текущий пользователь.
+
+    Множество загружается один раз за запрос и кешируется по версии
+    подписок пользователя, которую сбрасывают изменения подписок.
+    """
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    author_ids = getattr(request, '_subscribed_author_ids', None)
+    if author_ids is not None:
+        return author_ids
+    version = cache.get_or_set(
+        get_subscriptions_version_key(user.id), 0, None
+    )
+    key = SUBSCRIBED_AUTHORS_KEY.format(user_id=user.id, version=version)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = frozenset(
+            Subscription.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, author_ids)
+    request._subscribed_author_ids = author_ids
+    return author_ids
+
+
+def incr_subscriptions_version(user_id):
+    key = get_subscriptions_version_key(user_id)
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def bump_subscriptions_version(user_id):
+    """Сбрасываем кеш подписок после фиксации транзакции.
+
+    Иначе параллельный запрос успел бы закешировать старые подписки
+    под новой версией.
+    """
+    transaction.on_commit(lambda: incr_subscriptions_version(user_id))
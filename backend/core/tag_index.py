@@ -0,0 +1,48 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import F
+
+from core.constants import TAGS_MASK_BITS
+from recipes.models import Recipe
+
+
+def get_tag_bit(tag_id):
+    """Возвращаем бит тега в Recipe.tags_mask."""
+    if not 0 < tag_id <= TAGS_MASK_BITS:
+        raise ValueError(
+            f'Тег {tag_id} не помещается в маску тегов рецепта: '
+            f'поддерживаются id от 1 до {TAGS_MASK_BITS}.'
+        )
+    return 1 << (tag_id - 1)
+
+
+def get_tags_mask(tag_ids):
+    return reduce(or_, (get_tag_bit(tag_id) for tag_id in tag_ids), 0)
+
+
+def refresh_tags_mask(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    masks = defaultdict(int)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag_id'):
+        masks[recipe_id] |= get_tag_bit(tag_id)
+    for recipe_id in recipe_ids:
+        Recipe.objects.filter(id=recipe_id).update(
+            tags_mask=masks[recipe_id]
+        )
+
+
+def filter_by_tags(queryset, tags):
+    """Фильтруем рецепты, у которых есть хотя бы один из тегов.
+
+    Фильтр — одно условие на Recipe.tags_mask, без join и DISTINCT.
+    """
+    mask = get_tags_mask(tag.id for tag in tags)
+    if not mask:
+        return queryset
+    return queryset.alias(
+        tags_match=F('tags_mask').bitand(mask)
+    ).filter(tags_match__gt=0)
@@ -0,0 +1,36 @@
+from threading import current_thread
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from core.async_views import async_view
+
+
+def view(request):
+    return HttpResponse(current_thread().name)
+
+
+class AsyncViewTest(SimpleTestCase):
+
+    def get_thread_name(self, method, is_static=None):
+        request = getattr(RequestFactory(), method)('/api/recipes/')
+        response = async_to_sync(async_view(view, is_static))(request)
+        return response.content.decode()
+
+    def test_reads_use_db_pool(self):
+        for method in ('get', 'head', 'options'):
+            with self.subTest(method=method):
+                self.assertTrue(self.get_thread_name(method).startswith('db'))
+
+    def test_static_reads_skip_db_pool(self):
+        self.assertFalse(
+            self.get_thread_name('get', lambda request: True).startswith('db')
+        )
+
+    def test_writes_skip_db_pool(self):
+        for method in ('post', 'put', 'patch', 'delete'):
+            with self.subTest(method=method):
+                self.assertFalse(
+                    self.get_thread_name(method).startswith('db')
+                )
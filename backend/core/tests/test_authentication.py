@@ -0,0 +1,48 @@
+from core import authentication
+
+from api.tests.fixtures import CacheTestCase, create_user, get_client
+
+
+class CachedTokenAuthenticationTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+
+    def setUp(self):
+        super().setUp()
+        self.client = get_client(self.user)
+        self.key = self.client._credentials['HTTP_AUTHORIZATION'].split()[1]
+
+    def forget_in_process(self):
+        """Так запись выглядит в памяти другого воркера: сигнал сбросил
+        ее только в процессе, где изменили пользователя."""
+        entry = authentication._tokens[self.key]
+        self.addCleanup(authentication._tokens.pop, self.key, None)
+        return lambda: authentication._tokens.__setitem__(self.key, entry)
+
+    def get_status(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def test_deactivated_user_is_rejected_in_other_workers(self):
+        self.assertEqual(self.get_status(), 200)
+        restore = self.forget_in_process()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        restore()
+        self.assertEqual(self.get_status(), 401)
+
+    def test_deleted_token_is_rejected_in_other_workers(self):
+        self.assertEqual(self.get_status(), 200)
+        restore = self.forget_in_process()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        restore()
+        self.assertEqual(self.get_status(), 401)
+
+    def test_inactive_cached_user_is_rejected(self):
+        self.assertEqual(self.get_status(), 200)
+        authentication._tokens[self.key][1].is_active = False
+        self.assertEqual(self.get_status(), 401)
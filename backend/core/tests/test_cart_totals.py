@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+
+from core.shopping_cart import (apply_cart_totals_delta, get_live_cart_totals,
+                                get_stored_cart_totals)
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+from recipes.models import Cart, IngredientInCart, IngredientInRecipe
+
+
+class CartTotalsSignalsTest(CacheTestCase):
+    """Суммы корзин совпадают с пересчетом после правок через ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags()
+        cls.ingredients = create_ingredients(4)
+        cls.users = [create_user(number) for number in range(3)]
+        cls.recipes = [
+            create_recipe(
+                cls.users[0], f'Рецепт {number}', tags,
+                cls.ingredients[number:number + 2], amount=10 + number,
+            )
+            for number in range(2)
+        ]
+        for user in cls.users[:2]:
+            for recipe in cls.recipes:
+                Cart.objects.create(user=user, recipe=recipe)
+        Cart.objects.create(user=cls.users[2], recipe=cls.recipes[1])
+
+    def assert_totals(self):
+        self.assertEqual(get_stored_cart_totals(), get_live_cart_totals())
+
+    def get_row(self, recipe, ingredient):
+        return IngredientInRecipe.objects.get(
+            recipe=recipe, ingredient=ingredient
+        )
+
+    def test_initial_totals(self):
+        self.assert_totals()
+        self.assertTrue(get_stored_cart_totals())
+
+    def test_change_amount(self):
+        row = self.get_row(self.recipes[0], self.ingredients[1])
+        row.amount = 25
+        row.save()
+        self.assert_totals()
+
+    def test_change_ingredient(self):
+        row = self.get_row(self.recipes[0], self.ingredients[0])
+        row.ingredient = self.ingredients[3]
+        row.save()
+        self.assert_totals()
+
+    def test_move_to_other_recipe(self):
+        row = self.get_row(self.recipes[0], self.ingredients[0])
+        row.recipe = self.recipes[1]
+        row.save()
+        self.assert_totals()
+
+    def test_add_and_delete_row(self):
+        IngredientInRecipe.objects.create(
+            recipe=self.recipes[1], ingredient=self.ingredients[0], amount=7
+        )
+        self.assert_totals()
+        self.get_row(self.recipes[1], self.ingredients[1]).delete()
+        self.assert_totals()
+
+    def test_delete_ingredient(self):
+        self.ingredients[1].delete()
+        self.assert_totals()
+
+    def test_delete_recipe(self):
+        self.recipes[1].delete()
+        self.assert_totals()
+        self.assertNotIn(
+            self.users[2].id,
+            {user_id for user_id, _ in get_stored_cart_totals()},
+        )
+
+    def test_delete_cart(self):
+        Cart.objects.filter(user=self.users[0]).delete()
+        self.assert_totals()
+
+    def test_serializer_update(self):
+        response = get_client(self.users[0]).patch(
+            f'/api/recipes/{self.recipes[0].id}/',
+            {'ingredients': [
+                {'id': self.ingredients[1].id, 'amount': 30},
+                {'id': self.ingredients[2].id, 'amount': 5},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals()
+
+    def test_drift_is_not_clamped(self):
+        user, ingredient = self.users[2], self.ingredients[1]
+        apply_cart_totals_delta([user.id], {ingredient.id: -100})
+        self.assertLess(
+            IngredientInCart.objects.get(
+                user=user, ingredient=ingredient
+            ).amount,
+            0,
+        )
+        output = StringIO()
+        with mock.patch('sys.stdout', output), self.assertRaises(
+            CommandError
+        ):
+            call_command('rebuild_cart_totals', '--verify')
+        self.assertIn(
+            f'Пользователь {user.id}, ингредиент {ingredient.id}',
+            output.getvalue(),
+        )
+        with mock.patch('sys.stdout', StringIO()):
+            call_command('rebuild_cart_totals')
+        self.assert_totals()
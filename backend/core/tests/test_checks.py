@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import check_shared_caches
+
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'cache',
+}
+
+
+class SharedCachesCheckTest(SimpleTestCase):
+
+    @override_settings(CACHES={
+        'default': SHARED_CACHE,
+        'recipe_cards': {**SHARED_CACHE, 'KEY_PREFIX': 'recipe_cards'},
+    })
+    def test_shared_caches_pass(self):
+        self.assertEqual(check_shared_caches(None), [])
+
+    @override_settings(CACHES={
+        'default': SHARED_CACHE,
+        'recipe_cards': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    })
+    def test_local_cache_fails(self):
+        errors = check_shared_caches(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIn("'recipe_cards'", errors[0].msg)
+
+    def test_default_settings_fail(self):
+        self.assertEqual(
+            len(check_shared_caches(None)), len(settings.CACHES)
+        )
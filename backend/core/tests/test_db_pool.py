@@ -0,0 +1,212 @@
+from unittest import mock
+
+from django.db.backends.postgresql import base as postgresql
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.backends.postgresql.base import (DatabaseWrapper, check_connection,
+                                           close_pools_on_databases_change,
+                                           reset_connection)
+from core.db_pool import (ConnectionPool, PoolTimeoutError, close_pools,
+                          get_pool, get_pool_stats)
+
+ALIAS = 'pool_test'
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise postgresql.Database.OperationalError('server closed')
+
+
+class FakeConnection:
+    isolation_level = extensions.ISOLATION_LEVEL_READ_COMMITTED
+
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+
+def get_settings(name='foodgram', size=2):
+    return {
+        'NAME': name,
+        'USER': 'postgres',
+        'PASSWORD': '',
+        'HOST': 'db',
+        'PORT': 5432,
+        'OPTIONS': {},
+        'POOL_SIZE': size,
+        'POOL_TIMEOUT': 0.01,
+    }
+
+
+class PoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(close_pools)
+
+
+class ConnectionPoolTest(PoolTestCase):
+
+    def get_pool(self, size=2, check=check_connection,
+                 reset=reset_connection):
+        return ConnectionPool(size, 0.01, check, reset)
+
+    def test_checkout_reuses_connection(self):
+        pool = self.get_pool()
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        self.assertIs(pool.acquire(FakeConnection), connection)
+        self.assertEqual(pool.get_stats()['created'], 1)
+        self.assertEqual(pool.get_stats()['in_use'], 1)
+
+    def test_timeout_when_exhausted(self):
+        pool = self.get_pool(size=1)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+    def test_health_check_replaces_broken_connection(self):
+        pool = self.get_pool()
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        connection.broken = True
+        fresh = pool.acquire(FakeConnection)
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()['discarded'], 1)
+
+    def test_reset_rolls_back_open_transaction(self):
+        pool = self.get_pool()
+        connection = pool.acquire(FakeConnection)
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+
+    def test_failed_reset_discards_connection(self):
+        pool = self.get_pool()
+        connection = pool.acquire(FakeConnection)
+        connection.status = extensions.TRANSACTION_STATUS_UNKNOWN
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()['idle'], 0)
+        self.assertEqual(pool.get_stats()['in_use'], 0)
+
+    def test_drain_closes_idle_and_returned(self):
+        pool = self.get_pool()
+        idle = pool.acquire(FakeConnection)
+        in_use = pool.acquire(FakeConnection)
+        pool.release(idle)
+        pool.drain()
+        self.assertTrue(idle.closed)
+        pool.release(in_use)
+        self.assertTrue(in_use.closed)
+        self.assertEqual(pool.get_stats()['idle'], 0)
+
+
+class PoolRegistryTest(PoolTestCase):
+
+    def get_pool(self, params):
+        return get_pool(
+            ALIAS, params, 2, 0.01, check_connection, reset_connection
+        )
+
+    def test_pools_are_keyed_by_params(self):
+        pool = self.get_pool({'dbname': 'foodgram'})
+        self.assertIs(self.get_pool({'dbname': 'foodgram'}), pool)
+        self.assertIsNot(self.get_pool({'dbname': 'test_foodgram'}), pool)
+
+    def test_close_pools_resets_registry(self):
+        pool = self.get_pool({'dbname': 'foodgram'})
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        close_pools(ALIAS)
+        self.assertTrue(connection.closed)
+        self.assertNotIn(ALIAS, get_pool_stats())
+        self.assertIsNot(self.get_pool({'dbname': 'foodgram'}), pool)
+
+    def test_databases_change_closes_pools(self):
+        pool = self.get_pool({'dbname': 'foodgram'})
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        close_pools_on_databases_change(setting='TIME_ZONE')
+        self.assertFalse(connection.closed)
+        close_pools_on_databases_change(setting='DATABASES')
+        self.assertTrue(connection.closed)
+
+
+@mock.patch.object(
+    postgresql.DatabaseWrapper, 'get_new_connection',
+    side_effect=lambda conn_params: FakeConnection(),
+)
+class DatabaseWrapperTest(PoolTestCase):
+
+    def connect(self, wrapper):
+        wrapper.connection = wrapper.get_new_connection(
+            wrapper.get_connection_params()
+        )
+        return wrapper.connection
+
+    def test_connection_returns_to_its_pool(self, connect):
+        wrapper = DatabaseWrapper(get_settings(), ALIAS)
+        connection = self.connect(wrapper)
+        wrapper.close()
+        self.assertFalse(connection.closed)
+        self.assertIs(self.connect(wrapper), connection)
+        self.assertEqual(connect.call_count, 1)
+
+    def test_new_database_name_gets_new_connection(self, connect):
+        wrapper = DatabaseWrapper(get_settings(), ALIAS)
+        connection = self.connect(wrapper)
+        wrapper.close()
+        wrapper.settings_dict['NAME'] = 'test_foodgram'
+        self.assertIsNot(self.connect(wrapper), connection)
+        wrapper.close()
+        self.assertEqual(get_pool_stats()[ALIAS]['idle'], 2)
+
+    def test_no_db_connection_bypasses_pool(self, connect):
+        wrapper = DatabaseWrapper(get_settings(name='postgres'), NO_DB_ALIAS)
+        connection = self.connect(wrapper)
+        wrapper.close()
+        self.assertTrue(connection.closed)
+        self.assertNotIn(NO_DB_ALIAS, get_pool_stats())
+
+    def test_test_database_drop_closes_pool(self, connect):
+        wrapper = DatabaseWrapper(get_settings(), ALIAS)
+        connection = self.connect(wrapper)
+        wrapper.close()
+        with mock.patch.object(
+            postgresql.DatabaseWrapper.creation_class, '_destroy_test_db'
+        ) as destroy:
+            wrapper.creation._destroy_test_db('test_foodgram', 0)
+        destroy.assert_called_once_with('test_foodgram', 0)
+        self.assertTrue(connection.closed)
+        self.assertNotIn(ALIAS, get_pool_stats())
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.constants import PRIMARY_DB, PRIMARY_PIN_COOKIE
+from core.db_routers import PrimaryReplicaRouter, reads_from_replica
+from core.middleware import ReplicaRoutingMiddleware
+
+from api.tests.fixtures import clear_caches
+from recipes.models import Recipe
+
+REPLICAS = ['replica_1']
+STICKY_SECONDS = 10
+AUTHORIZATION = 'Token 0123456789abcdef'
+
+
+@override_settings(
+    DATABASE_REPLICAS=REPLICAS, REPLICA_STICKY_SECONDS=STICKY_SECONDS
+)
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.routes = []
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.routes.append((
+            reads_from_replica(),
+            PrimaryReplicaRouter().db_for_read(Recipe),
+            PrimaryReplicaRouter().db_for_read(Token),
+        ))
+        return HttpResponse(status=getattr(request, 'status', 200))
+
+    def request(self, method, cookies=None, status=200, **extra):
+        request = getattr(RequestFactory(), method)('/api/recipes/', **extra)
+        request.COOKIES.update(cookies or {})
+        request.status = status
+        response = self.middleware(request)
+        return self.routes[-1], response
+
+    def test_router_selection(self):
+        (replica, recipes_db, tokens_db), _ = self.request('get')
+        self.assertTrue(replica)
+        self.assertIn(recipes_db, REPLICAS)
+        self.assertEqual(tokens_db, PRIMARY_DB)
+        (replica, recipes_db, _), _ = self.request('post')
+        self.assertFalse(replica)
+        self.assertEqual(recipes_db, PRIMARY_DB)
+        self.assertFalse(reads_from_replica())
+
+    @override_settings(DATABASE_REPLICAS=[f'replica_{n}' for n in range(8)])
+    def test_request_reads_from_one_replica(self):
+        def get_response(request):
+            self.routes.append({
+                PrimaryReplicaRouter().db_for_read(Recipe)
+                for _ in range(20)
+            })
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        for _ in range(5):
+            middleware(RequestFactory().get('/api/recipes/'))
+            self.assertEqual(len(self.routes[-1]), 1)
+
+    def test_failed_write_does_not_pin(self):
+        _, response = self.request(
+            'post', status=400, HTTP_AUTHORIZATION=AUTHORIZATION
+        )
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+        (replica, _, _), _ = self.request(
+            'get', HTTP_AUTHORIZATION=AUTHORIZATION
+        )
+        self.assertTrue(replica)
+
+    def test_pin_by_token_expires(self):
+        with mock.patch('time.time', return_value=1000.0):
+            self.request('post', HTTP_AUTHORIZATION=AUTHORIZATION)
+            (replica, recipes_db, _), _ = self.request(
+                'get', HTTP_AUTHORIZATION=AUTHORIZATION
+            )
+            self.assertFalse(replica)
+            self.assertEqual(recipes_db, PRIMARY_DB)
+            (replica, _, _), _ = self.request('get')
+            self.assertTrue(replica)
+        with mock.patch('time.time', return_value=1000.0 + STICKY_SECONDS):
+            (replica, _, _), _ = self.request(
+                'get', HTTP_AUTHORIZATION=AUTHORIZATION
+            )
+            self.assertTrue(replica)
+
+    def test_pin_by_cookie_expires(self):
+        with mock.patch('time.time', return_value=1000.0):
+            _, response = self.request('post')
+            cookies = {
+                PRIMARY_PIN_COOKIE: response.cookies[PRIMARY_PIN_COOKIE].value
+            }
+            self.assertEqual(
+                response.cookies[PRIMARY_PIN_COOKIE]['max-age'],
+                STICKY_SECONDS,
+            )
+            (replica, _, _), _ = self.request('get', cookies=cookies)
+            self.assertFalse(replica)
+        with mock.patch(
+            'time.time', return_value=1000.0 + STICKY_SECONDS + 1
+        ):
+            (replica, _, _), _ = self.request('get', cookies=cookies)
+            self.assertTrue(replica)
+
+    def test_forged_cookie_is_ignored(self):
+        (replica, _, _), _ = self.request(
+            'get', cookies={PRIMARY_PIN_COOKIE: '1'}
+        )
+        self.assertTrue(replica)
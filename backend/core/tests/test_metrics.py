@@ -0,0 +1,37 @@
+from django.test import override_settings
+from rest_framework.serializers import ListSerializer, Serializer
+
+from core.metrics import HISTOGRAMS
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+
+DATA_PROPERTIES = {
+    serializer_class: serializer_class.data
+    for serializer_class in (Serializer, ListSerializer)
+}
+
+
+@override_settings(
+    REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SERVER_TIMING=True
+)
+class RequestMetricsTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipe(
+            create_user(0), 'Рецепт', create_tags(), create_ingredients(2)
+        )
+
+    def test_serializer_time_is_measured_in_views(self):
+        response = get_client().get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        self.assertIn(
+            ('RecipeViewSet.list', 'GET'),
+            HISTOGRAMS['serializer_time'].series,
+        )
+        for serializer_class, data in DATA_PROPERTIES.items():
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertIs(serializer_class.data, data)
@@ -0,0 +1,41 @@
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+from recipes.models import Cart, FavoriteRecipe, Recipe
+
+
+class RecipeCountersTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(number) for number in range(2)]
+        cls.recipe = create_recipe(
+            cls.users[0], 'Рецепт', create_tags(), create_ingredients(2)
+        )
+
+    def get_counters(self):
+        return Recipe.objects.values_list(
+            'favorites_count', 'in_carts_count'
+        ).get(id=self.recipe.id)
+
+    def test_orm_writes_change_counters(self):
+        for user in self.users:
+            FavoriteRecipe.objects.create(user=user, recipe=self.recipe)
+            Cart.objects.create(user=user, recipe=self.recipe)
+        self.assertEqual(self.get_counters(), (2, 2))
+        FavoriteRecipe.objects.filter(user=self.users[0]).delete()
+        self.assertEqual(self.get_counters(), (1, 2))
+        self.users[1].delete()
+        self.assertEqual(self.get_counters(), (0, 1))
+
+    def test_services_change_counters_once(self):
+        client = get_client(self.users[1])
+        for action in ('favorite', 'shopping_cart'):
+            response = client.post(
+                f'/api/recipes/{self.recipe.id}/{action}/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_counters(), (1, 1))
+        response = client.delete(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counters(), (0, 1))
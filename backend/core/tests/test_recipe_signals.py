@@ -0,0 +1,69 @@
+from unittest import mock
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+
+RECIPE_REFRESHERS = {
+    'invalidate_recipe_cards': 'core.cards',
+    'refresh_search_index': 'core.search',
+    'mark_recipes_changed': 'core.similar',
+}
+
+
+class RecipeIngredientsSignalsTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.ingredients = create_ingredients(6)
+        cls.recipe = create_recipe(
+            cls.user, 'Рецепт', create_tags(), cls.ingredients[:5]
+        )
+
+    def patch(self, target):
+        patcher = mock.patch(target)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def patch_signals(self):
+        return {
+            name: self.patch(f'core.signals.{name}')
+            for name in RECIPE_REFRESHERS
+        }
+
+    def test_serializer_refreshes_recipe_once(self):
+        """Удаление нескольких строк не запускает обновление на строку."""
+        signals = self.patch_signals()
+        serializer = {
+            name: self.patch(f'{module}.{name}')
+            for name, module in RECIPE_REFRESHERS.items()
+        }
+        response = get_client(self.user).patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 20},
+                {'id': self.ingredients[5].id, 'amount': 5},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        for name in RECIPE_REFRESHERS:
+            with self.subTest(name=name):
+                signals[name].assert_not_called()
+                serializer[name].assert_called_once_with([self.recipe.id])
+
+    def test_orm_delete_refreshes_recipe(self):
+        signals = self.patch_signals()
+        self.recipe.ingredientinrecipe_set.first().delete()
+        for name in RECIPE_REFRESHERS:
+            with self.subTest(name=name):
+                signals[name].assert_called_once_with([self.recipe.id])
+
+    def test_ingredient_index_invalidated_after_commit(self):
+        invalidate = self.patch('core.signals.invalidate_ingredient_index')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[0].name = 'Новое название'
+            self.ingredients[0].save()
+            invalidate.assert_not_called()
+        invalidate.assert_called_once_with()
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from core.subscriptions import (get_subscribed_author_ids,
+                                get_subscriptions_version_key)
+
+from api.tests.fixtures import CacheTestCase, create_user
+from users.models import Subscription
+
+
+class SubscriptionsCacheTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+
+    def get_author_ids(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return get_subscribed_author_ids(request)
+
+    def test_version_changes_after_commit(self):
+        self.assertEqual(self.get_author_ids(), frozenset())
+        key = get_subscriptions_version_key(self.user.id)
+        version = cache.get(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.user, author=self.author)
+            # До фиксации параллельный запрос видит старые строки:
+            # версия не должна меняться, пока их можно закешировать.
+            self.assertEqual(cache.get(key), version)
+        self.assertNotEqual(cache.get(key), version)
+        self.assertEqual(self.get_author_ids(), {self.author.id})
@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from core.constants import TAGS_MASK_BITS
+
+from api.tests.fixtures import (CacheTestCase, create_ingredients,
+                                create_recipe, create_tags, create_user,
+                                get_client)
+from recipes.models import Recipe, Tag
+
+
+class TagFilterTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags()
+        ingredients = create_ingredients(1)
+        user = create_user(0)
+        cls.recipes = [
+            create_recipe(user, f'Рецепт {number}', [tag], ingredients)
+            for number, tag in enumerate(cls.tags)
+        ]
+
+    def get_ids(self, *slugs):
+        response = get_client().get('/api/recipes/', {'tags': slugs})
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.json()['results']}
+
+    def test_filter_by_tags(self):
+        self.assertEqual(self.get_ids('breakfast'), {self.recipes[0].id})
+        self.assertEqual(
+            self.get_ids('breakfast', 'dinner'),
+            {self.recipes[0].id, self.recipes[2].id},
+        )
+
+    def test_tag_without_bit_is_rejected(self):
+        tag = Tag.objects.create(
+            id=TAGS_MASK_BITS + 1, name='Перекус', color='#000000',
+            slug='snack',
+        )
+        response = get_client().get('/api/recipes/', {'tags': 'snack'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.recipes[0].tags.add(tag)
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipes[0].id).tags.count(), 1
+        )
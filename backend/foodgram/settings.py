@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,7 +50,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -93,10 +95,81 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'django'),
         'HOST': os.getenv('DB_HOST', 'db',),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 0)),
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
     }
 }
 
+# Тестовая база SQLite — файл, а не память: в тестах с потоками
+# запись ждет блокировку, а не падает с «table is locked».
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+    }
+
+# Пул соединений с PostgreSQL включается явно: DB_POOL_SIZE > 0 —
+# столько соединений держит процесс, перед выдачей они проверяются.
+if (
+    DATABASES['default']['POOL_SIZE']
+    and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+):
+    DATABASES['default']['ENGINE'] = 'core.backends.postgresql'
+
+# Реплики: DB_REPLICA_HOSTS — хосты через запятую (host или host:port),
+# DB_REPLICA_NAMES — имена баз (для SQLite — пути к файлам). Если задан
+# только один список, остальное берется из основной базы.
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+DB_REPLICA_NAMES = [
+    name for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name
+]
+DATABASE_REPLICAS = []
+for number in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    host, _, port = (
+        DB_REPLICA_HOSTS[number] if number < len(DB_REPLICA_HOSTS) else ''
+    ).partition(':')
+    alias = f'replica_{number + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': (
+            DB_REPLICA_NAMES[number] if number < len(DB_REPLICA_NAMES)
+            else DATABASES['default']['NAME']
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+
+
+# Версии данных, журнал изменений похожих рецептов, отметки реплик
+# и карточки рецептов должны быть общими для всех процессов: в
+# docker-compose это memcached. LocMemCache годится для разработки
+# и тестов, check --deploy при нем падает.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'recipe_cards': {
+        'BACKEND': os.getenv(
+            'RECIPE_CARDS_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('RECIPE_CARDS_CACHE_LOCATION', 'recipe_cards'),
+        'KEY_PREFIX': 'recipe_cards',
+        'TIMEOUT': int(os.getenv('RECIPE_CARDS_CACHE_TIMEOUT', 60 * 60 * 24)),
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -134,5 +207,43 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+IMAGE_PIPELINE_SYNC = (
+    os.getenv('IMAGE_PIPELINE_SYNC', 'False').lower() == 'true'
+)
+
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_SHARED_CACHE = os.getenv('TOKEN_AUTH_SHARED_CACHE')
+TOKEN_AUTH_SHARED_CACHE_TTL = int(
+    os.getenv('TOKEN_AUTH_SHARED_CACHE_TTL', 60 * 60)
+)
+
+REQUEST_METRICS_ENABLED = (
+    os.getenv('REQUEST_METRICS_ENABLED', 'False').lower() == 'true'
+)
+REQUEST_METRICS_SERVER_TIMING = (
+    os.getenv('REQUEST_METRICS_SERVER_TIMING', 'False').lower() == 'true'
+)
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+RECIPE_BATCH_MAX_SIZE = int(os.getenv('RECIPE_BATCH_MAX_SIZE', 100))
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 10))
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+FEED_FANOUT_WORKERS = int(os.getenv('FEED_FANOUT_WORKERS', 2))
+FEED_FANOUT_SYNC = os.getenv('FEED_FANOUT_SYNC', 'False').lower() == 'true'
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv('FEED_FANOUT_MAX_SUBSCRIBERS', 10000)
+)
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 1000))
+
+SIMILAR_INDEX_PATH = os.getenv(
+    'SIMILAR_INDEX_PATH', os.path.join(BASE_DIR, 'similar_recipes.idx')
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from recipes.models import (Cart, FavoriteRecipe, Ingredient, Recipe,
-                            IngredientInRecipe, Tag)
+from recipes.models import (Cart, FavoriteRecipe, Ingredient,
+                            IngredientInCart, IngredientInRecipe, Recipe, Tag)
 
 
 class IngredientInRecipeInline(admin.TabularInline):
@@ -101,7 +101,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Кол-во добавлений')
     def in_favorite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(IngredientInRecipe)
@@ -115,6 +115,25 @@ class IngredientInRecipeAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(IngredientInCart)
+class IngredientInCartAdmin(admin.ModelAdmin):
+    """Админ панель сумм ингредиентов в списках покупок."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
+    list_filter = (
+        'user',
+    )
+    readonly_fields = (
+        'user',
+        'ingredient',
+        'amount',
+    )
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """Админ панель модели тегов."""
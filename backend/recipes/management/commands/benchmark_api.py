@@ -0,0 +1,301 @@
+import json
+from base64 import b64encode
+from io import BytesIO
+from itertools import combinations
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.generate_fake_data import (PASSWORD,
+                                                            USERNAME_PREFIX)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import Subscription, User
+
+PERCENTILES = (50, 95, 99)
+RECIPE_FILTERS = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    rank = max(round(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число запросов к базе для всех маршрутов '
+        'API на данных generate_fake_data и сравнивает с базовой линией. '
+        'Изменяющие запросы откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--only', help='Запускать сценарии, в названии которых есть '
+                           'эта подстрока.',
+        )
+        parser.add_argument('--baseline', help='JSON для сравнения.')
+        parser.add_argument(
+            '--save-baseline', help='Сохранить результаты в JSON.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Порог регрессии p95 в процентах.',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).annotate(
+            carts=Count('shopping_cart', distinct=True),
+            own_recipes=Count('recipe_author', distinct=True),
+        ).filter(own_recipes__gt=0).order_by('-carts').first()
+        if user is None:
+            raise CommandError(
+                'Нет синтетических данных, запустите generate_fake_data.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {
+            'anonymous': Client(),
+            'user': Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+        }
+        with TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            results = {}
+            for name, client, write, request in self.get_scenarios(user):
+                if options['only'] and options['only'] not in name:
+                    continue
+                results[name] = self.measure(
+                    clients[client], write, request, options
+                )
+                self.report(name, results[name])
+        if options['baseline']:
+            self.compare(
+                results,
+                json.loads(Path(options['baseline']).read_text()),
+                options['threshold'],
+            )
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(
+                json.dumps(results, ensure_ascii=False, indent=2)
+            )
+            print(f'Базовая линия сохранена в {options["save_baseline"]}.')
+
+    def get_scenarios(self, user):
+        """Сценарии: название, клиент, изменяет ли данные, запрос."""
+        tags = list(Tag.objects.values_list('id', 'slug')[:2])
+        ingredients = list(Ingredient.objects.values_list('id', 'name')[:3])
+        own_recipe = Recipe.objects.filter(author=user).first()
+        other_recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user
+        ).exclude(shopping_cart__user=user).order_by(
+            '-favorites_count'
+        ).first()
+        favorite = Recipe.objects.filter(favorites__user=user).first()
+        in_cart = Recipe.objects.filter(shopping_cart__user=user).first()
+        author = User.objects.exclude(id=user.id).exclude(
+            author_in_subscription__user=user
+        ).annotate(
+            recipes=Count('recipe_author')
+        ).order_by('-recipes').first()
+        subscription = Subscription.objects.filter(user=user).first()
+        recipe_payload = {
+            'name': 'Тестовый рецепт',
+            'text': 'Описание тестового рецепта',
+            'cooking_time': 10,
+            'tags': [tags[0][0]],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id, _ in ingredients
+            ],
+            'image': get_image(),
+        }
+        filter_values = {
+            'tags': {'tags': [slug for _, slug in tags]},
+            'author': {'author': other_recipe.author_id},
+            'is_favorited': {'is_favorited': 1},
+            'is_in_shopping_cart': {'is_in_shopping_cart': 1},
+            'search': {'search': ingredients[0][1].split()[0]},
+            'ordering': {'ordering': 'popular'},
+        }
+
+        yield 'tags list', 'anonymous', False, ('get', '/api/tags/', None)
+        yield 'tags detail', 'anonymous', False, (
+            'get', f'/api/tags/{tags[0][0]}/', None
+        )
+        yield 'ingredients list', 'anonymous', False, (
+            'get', '/api/ingredients/', None
+        )
+        yield 'ingredients search', 'anonymous', False, (
+            'get', '/api/ingredients/', {'name': ingredients[0][1][:3]}
+        )
+        yield 'ingredients detail', 'anonymous', False, (
+            'get', f'/api/ingredients/{ingredients[0][0]}/', None
+        )
+        yield 'recipes list anonymous', 'anonymous', False, (
+            'get', '/api/recipes/', None
+        )
+        yield 'recipes list cursor', 'user', False, (
+            'get', '/api/recipes/', {'pagination': 'cursor'}
+        )
+        for size in range(len(RECIPE_FILTERS) + 1):
+            for names in combinations(RECIPE_FILTERS, size):
+                params = {}
+                for name in names:
+                    params.update(filter_values[name])
+                yield (
+                    f'recipes list [{", ".join(names) or "no filters"}]',
+                    'user', False, ('get', '/api/recipes/', params),
+                )
+        yield 'recipes detail', 'user', False, (
+            'get', f'/api/recipes/{other_recipe.id}/', None
+        )
+        yield 'feed', 'user', False, ('get', '/api/recipes/feed/', None)
+        yield 'download shopping cart', 'user', False, (
+            'get', '/api/recipes/download_shopping_cart/', None
+        )
+        yield 'users list', 'user', False, ('get', '/api/users/', None)
+        yield 'users detail', 'user', False, (
+            'get', f'/api/users/{author.id}/', None
+        )
+        yield 'users me', 'user', False, ('get', '/api/users/me/', None)
+        yield 'subscriptions', 'user', False, (
+            'get', '/api/users/subscriptions/', {'recipes_limit': 3}
+        )
+
+        yield 'recipe create', 'user', True, (
+            'post', '/api/recipes/', recipe_payload
+        )
+        yield 'recipe update', 'user', True, (
+            'patch', f'/api/recipes/{own_recipe.id}/',
+            {'name': 'Новое название'},
+        )
+        yield 'recipe delete', 'user', True, (
+            'delete', f'/api/recipes/{own_recipe.id}/', None
+        )
+        for action in ('favorite', 'shopping_cart'):
+            yield f'{action} add', 'user', True, (
+                'post', f'/api/recipes/{other_recipe.id}/{action}/', None
+            )
+            yield f'{action} batch add', 'user', True, (
+                'post', f'/api/recipes/{action}/',
+                {'recipes': [other_recipe.id, own_recipe.id]},
+            )
+        if favorite is not None:
+            yield 'favorite delete', 'user', True, (
+                'delete', f'/api/recipes/{favorite.id}/favorite/', None
+            )
+        if in_cart is not None:
+            yield 'shopping_cart delete', 'user', True, (
+                'delete', f'/api/recipes/{in_cart.id}/shopping_cart/', None
+            )
+        yield 'subscribe', 'user', True, (
+            'post', f'/api/users/{author.id}/subscribe/', None
+        )
+        if subscription is not None:
+            yield 'unsubscribe', 'user', True, (
+                'delete',
+                f'/api/users/{subscription.author_id}/subscribe/',
+                None,
+            )
+        yield 'user create', 'anonymous', True, ('post', '/api/users/', {
+            'email': 'benchmark@example.com',
+            'username': 'benchmark_user',
+            'first_name': 'Тест',
+            'last_name': 'Тестов',
+            'password': 'Benchmark-password-1',
+        })
+        yield 'set password', 'user', True, (
+            'post', '/api/users/set_password/',
+            {'current_password': PASSWORD, 'new_password': PASSWORD + '-2'},
+        )
+        yield 'token login', 'anonymous', True, (
+            'post', '/api/auth/token/login/',
+            {'email': user.email, 'password': PASSWORD},
+        )
+        yield 'token logout', 'user', True, (
+            'post', '/api/auth/token/logout/', None
+        )
+
+    def send(self, client, request):
+        method, path, data = request
+        if method == 'get':
+            return client.get(path, data)
+        return getattr(client, method)(
+            path,
+            data=json.dumps(data) if data is not None else None,
+            content_type='application/json',
+        )
+
+    def measure(self, client, write, request, options):
+        timings, queries, statuses = [], 0, set()
+        for iteration in range(options['warmup'] + options['repeat']):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    started = perf_counter()
+                    response = self.send(client, request)
+                    elapsed = perf_counter() - started
+                if write:
+                    transaction.set_rollback(True)
+            if iteration < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            queries = len(captured.captured_queries)
+            statuses.add(response.status_code)
+        return {
+            **{
+                f'p{percent}': percentile(timings, percent)
+                for percent in PERCENTILES
+            },
+            'queries': queries,
+            'statuses': sorted(statuses),
+        }
+
+    def report(self, name, result):
+        failed = any(status >= 400 for status in result['statuses'])
+        print(
+            f'{name:<80} '
+            + ' '.join(
+                f'p{percent} {result[f"p{percent}"]:8.2f} мс'
+                for percent in PERCENTILES
+            )
+            + f'  запросов {result["queries"]:3}'
+            + (f'  статус {result["statuses"]}' if failed else '')
+        )
+
+    def compare(self, results, baseline, threshold):
+        print('Сравнение с базовой линией (p95, запросы):')
+        regressions = 0
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            change = (result['p95'] / base['p95'] - 1) * 100
+            queries = result['queries'] - base['queries']
+            regression = change > threshold or queries > 0
+            regressions += regression
+            print(
+                f'{"!" if regression else " "} {name:<80} '
+                f'{change:+7.1f}%  запросов {queries:+d}'
+            )
+        print(f'Регрессий: {regressions}.')
@@ -0,0 +1,196 @@
+import os
+import socket
+import sys
+from http.client import HTTPConnection, HTTPException
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from urllib.parse import quote
+
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.benchmark_api import (PERCENTILES,
+                                                       percentile)
+from recipes.management.commands.generate_fake_data import USERNAME_PREFIX
+from recipes.management.commands.load_test import start_server
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+HOST = '127.0.0.1'
+SERVERS = {
+    'WSGI': (
+        'foodgram.wsgi:application', ('--worker-class', 'sync'), 'False'
+    ),
+    'ASGI': (
+        'foodgram.asgi:application',
+        ('--worker-class', 'uvicorn.workers.UvicornWorker'),
+        'True',
+    ),
+}
+SLOW_HEADER_INTERVAL = 0.5
+SLOW_CLIENT_TIMEOUT = 10
+
+
+def hold_slow_connection(port, stop):
+    """Медленный клиент: отправляет заголовки запроса по одному."""
+    try:
+        with socket.create_connection(
+            (HOST, port), timeout=SLOW_CLIENT_TIMEOUT
+        ) as connection:
+            connection.sendall(
+                f'GET /api/tags/ HTTP/1.1\r\nHost: {HOST}\r\n'.encode()
+            )
+            while not stop.wait(SLOW_HEADER_INTERVAL):
+                connection.sendall(b'X-Slow-Client: 1\r\n')
+            connection.sendall(b'\r\n')
+            connection.recv(1)
+    except OSError:
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI (синхронные воркеры gunicorn) и ASGI (uvicorn, '
+        'асинхронные представления) при одинаковом числе процессов: '
+        'пропускную способность и задержки чтений, пока сервер держит '
+        'заданное число медленных соединений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8790)
+        parser.add_argument(
+            '--slow-clients', default='0,10,100',
+            help='Числа медленных соединений через запятую.',
+        )
+        parser.add_argument(
+            '--clients', type=int, default=8,
+            help='Клиентов, отправляющих обычные запросы.',
+        )
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--timeout', type=float, default=5,
+            help='Секунды, после которых запрос считается ошибкой.',
+        )
+
+    def handle(self, *args, **options):
+        paths = self.get_paths()
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).annotate(carts=Count('shopping_cart')).order_by('-carts').first()
+        if user is None:
+            raise CommandError(
+                'Нет синтетических данных, запустите generate_fake_data.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+        levels = [int(level) for level in options['slow_clients'].split(',')]
+        for mode, (application, worker, async_views) in SERVERS.items():
+            server = start_server(
+                [
+                    sys.executable, '-m', 'gunicorn', application,
+                    '--bind', f'{HOST}:{options["port"]}',
+                    '--workers', str(options['workers']),
+                    '--log-level', 'warning', *worker,
+                ],
+                HOST,
+                options['port'],
+                env={**os.environ, 'ASYNC_READ_VIEWS': async_views},
+            )
+            try:
+                self.warm_up(paths, headers, options)
+                for slow_clients in levels:
+                    self.report(mode, slow_clients, self.run(
+                        paths, headers, slow_clients, options
+                    ))
+            finally:
+                server.terminate()
+                server.wait()
+
+    def get_paths(self):
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        if ingredient is None or recipe_id is None:
+            raise CommandError('В базе нет ингредиентов или рецептов.')
+        return [
+            '/api/tags/',
+            f'/api/ingredients/?name={quote(ingredient[:3])}',
+            '/api/recipes/',
+            f'/api/recipes/{recipe_id}/',
+            '/api/recipes/download_shopping_cart/',
+        ]
+
+    def warm_up(self, paths, headers, options):
+        # Каждому процессу нужно построить индекс ингредиентов и кэши.
+        connection = HTTPConnection(HOST, options['port'])
+        for _ in range(options['workers'] * 2):
+            for path in paths:
+                connection.request('GET', path, headers=headers)
+                connection.getresponse().read()
+        connection.close()
+
+    def run(self, paths, headers, slow_clients, options):
+        stop = Event()
+        slow = [
+            Thread(target=hold_slow_connection, args=(options['port'], stop))
+            for _ in range(slow_clients)
+        ]
+        for thread in slow:
+            thread.start()
+        sleep(SLOW_HEADER_INTERVAL)
+        lock = Lock()
+        samples = []
+        deadline = perf_counter() + options['duration']
+
+        def client(offset):
+            connection = HTTPConnection(
+                HOST, options['port'], timeout=options['timeout']
+            )
+            results = []
+            number = offset
+            while perf_counter() < deadline:
+                path = paths[number % len(paths)]
+                number += 1
+                started = perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, HTTPException):
+                    connection.close()
+                    ok = False
+                results.append((perf_counter() - started, ok))
+            connection.close()
+            with lock:
+                samples.extend(results)
+
+        clients = [
+            Thread(target=client, args=(offset,))
+            for offset in range(options['clients'])
+        ]
+        started = perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = perf_counter() - started
+        stop.set()
+        for thread in slow:
+            thread.join()
+        return samples, elapsed
+
+    def report(self, mode, slow_clients, result):
+        samples, elapsed = result
+        completed = [latency * 1000 for latency, ok in samples if ok]
+        errors = len(samples) - len(completed)
+        print(
+            f'{mode}, медленных соединений {slow_clients:4}: '
+            f'{len(completed) / elapsed:8.1f} запр./с, ошибок {errors:5}, '
+            + ' '.join(
+                f'p{percent} {percentile(completed, percent):8.2f} мс'
+                if completed else f'p{percent}        — мс'
+                for percent in PERCENTILES
+            )
+        )
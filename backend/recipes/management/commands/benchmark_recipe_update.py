@@ -0,0 +1,151 @@
+from base64 import b64encode
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.fields import SkipField
+
+from api.serializers import RecipeImageField, WriteRecipeSerializer
+from core import shopping_cart
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+
+class ReinsertRecipeSerializer(WriteRecipeSerializer):
+    """Прежнее обновление: теги и ингредиенты записываются заново."""
+
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients')
+        instance.tags.set(tags)
+        old_amounts = shopping_cart.get_recipe_amounts(instance.id)
+        instance.ingredients.clear()
+        self.add_ingredients(instance, ingredients)
+        shopping_cart.update_recipe_in_cart_totals(
+            recipe_id=instance.id,
+            old_amounts=old_amounts,
+            new_amounts={
+                ingredient['id']: ingredient['amount']
+                for ingredient in ingredients
+            },
+        )
+        return super(WriteRecipeSerializer, self).update(
+            instance, validated_data
+        )
+
+
+STRATEGIES = {
+    'удаление и вставка': ReinsertRecipeSerializer,
+    'по разнице': WriteRecipeSerializer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает обновление рецепта по разнице с удалением и повторной '
+        'вставкой ингредиентов. Изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'recipe', nargs='?', type=int,
+            help='id рецепта. По умолчанию рецепт с наибольшим '
+                 'числом ингредиентов.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.annotate(
+            ingredients_count=Count('ingredientinrecipe')
+        ).order_by('-ingredients_count')
+        if options['recipe'] is not None:
+            recipes = recipes.filter(id=options['recipe'])
+        recipe = recipes.first()
+        if recipe is None:
+            raise CommandError('Рецепт не найден.')
+        payload = {
+            'name': recipe.name,
+            'tags': list(recipe.tags.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in
+                IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                    'ingredient_id', 'amount'
+                )
+            ],
+        }
+        print(
+            f'Рецепт {recipe.id}: ингредиентов '
+            f'{len(payload["ingredients"])}, тегов {len(payload["tags"])}.'
+        )
+        for name, changed_payload in self.get_scenarios(payload):
+            for strategy, serializer_class in STRATEGIES.items():
+                self.run(
+                    f'{name}, {strategy}', serializer_class, recipe,
+                    changed_payload, options['repeat'],
+                )
+        if recipe.image:
+            self.run_image(recipe, options['repeat'])
+
+    def get_scenarios(self, payload):
+        yield 'без изменений', payload
+        yield 'новое название', {**payload, 'name': payload['name'] + '!'}
+        ingredients = payload['ingredients']
+        if ingredients:
+            yield 'изменено одно количество', {
+                **payload,
+                'ingredients': [
+                    {**ingredients[0], 'amount': ingredients[0]['amount'] + 1},
+                    *ingredients[1:],
+                ],
+            }
+            replacement = Ingredient.objects.exclude(
+                id__in=[ingredient['id'] for ingredient in ingredients]
+            ).values_list('id', flat=True).first()
+            if replacement is not None:
+                yield 'заменен один ингредиент', {
+                    **payload,
+                    'ingredients': [
+                        {'id': replacement, 'amount': 1}, *ingredients[1:]
+                    ],
+                }
+
+    def run(self, name, serializer_class, recipe, payload, repeat):
+        elapsed, queries = 0, 0
+        for _ in range(repeat):
+            with transaction.atomic():
+                recipe = Recipe.objects.get(id=recipe.id)
+                with CaptureQueriesContext(connection) as captured:
+                    started = perf_counter()
+                    serializer = serializer_class(
+                        recipe, data=payload, partial=True
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+                    elapsed += perf_counter() - started
+                queries = len(captured.captured_queries)
+                transaction.set_rollback(True)
+        print(
+            f'{name}: {queries} запросов, {elapsed / repeat * 1000:.2f} мс.'
+        )
+
+    def run_image(self, recipe, repeat):
+        with recipe.image.open('rb') as image_file:
+            data = b64encode(image_file.read()).decode()
+        fields = {
+            'Base64ImageField': Base64ImageField(),
+            'RecipeImageField': RecipeImageField(),
+        }
+        parent = WriteRecipeSerializer(recipe)
+        for name, field in fields.items():
+            field.bind(field_name='image', parent=parent)
+            started = perf_counter()
+            for _ in range(repeat):
+                try:
+                    field.run_validation(data)
+                except SkipField:
+                    pass
+            elapsed = (perf_counter() - started) / repeat
+            print(f'картинка, {name}: {elapsed * 1000:.2f} мс.')
@@ -0,0 +1,141 @@
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from core.constants import SIMILAR_RECIPES_LIMIT
+from core.similar import (SimilarIndex, SimilarOverlay, find_similar,
+                          get_recipe_vectors, write_similar_index)
+from core.tag_index import get_tags_mask
+
+from recipes.management.commands.benchmark_api import PERCENTILES, percentile
+from recipes.management.commands.generate_fake_data import (
+    INGREDIENT_POPULARITY, MAX_INGREDIENTS, MIN_INGREDIENTS, get_cum_weights)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет сборку индекса похожих рецептов и время поиска по нему, '
+        'в том числе с рецептами, измененными после сборки. Рецепты '
+        'читаются из базы или генерируются (--synthetic) с тем же '
+        'распределением ингредиентов, что у generate_fake_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', type=int, metavar='RECIPES',
+            help='Не читать базу, а сгенерировать столько рецептов.',
+        )
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=3)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument(
+            '--recall-queries', type=int, default=100,
+            help='Сколько запросов сверить с точным поиском.',
+        )
+        parser.add_argument(
+            '--changes', type=int, default=1000,
+            help='Сколько рецептов изменено после сборки индекса.',
+        )
+        parser.add_argument('--limit', type=int, default=SIMILAR_RECIPES_LIMIT)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        started = perf_counter()
+        if options['synthetic']:
+            vectors = self.generate_vectors(
+                range(1, options['synthetic'] + 1),
+                options['ingredients'],
+                options['tags'],
+            )
+        else:
+            vectors = get_recipe_vectors()
+        self.report_time(f'Чтение {len(vectors)} рецептов', started)
+        recipe_ids = list(vectors)
+        queries = random.choices(recipe_ids, k=options['queries'])
+        changed = random.sample(
+            recipe_ids, min(options['changes'], len(recipe_ids))
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'similar_recipes.idx')
+            started = perf_counter()
+            write_similar_index(path, vectors.items(), 0)
+            self.report_time(
+                f'Сборка индекса, {os.path.getsize(path) / 2 ** 20:.1f} МБ',
+                started,
+            )
+            started = perf_counter()
+            index = SimilarIndex(path)
+            self.report_time('Открытие индекса', started)
+            overlay = SimilarOverlay(index, index.changes)
+            self.report_queries('Поиск', index, overlay, queries, options)
+            self.report_recall(
+                index, overlay, queries[:options['recall_queries']], options
+            )
+            started = perf_counter()
+            overlay.apply(index.changes + 1, (
+                self.generate_vectors(
+                    changed, options['ingredients'], options['tags']
+                ) if options['synthetic']
+                else {recipe_id: vectors[recipe_id] for recipe_id in changed}
+            ))
+            self.report_time(
+                f'Применение {len(changed)} изменений', started
+            )
+            self.report_queries(
+                f'Поиск с {len(changed)} изменениями',
+                index, overlay, queries, options,
+            )
+            del index
+
+    def generate_vectors(self, recipe_ids, ingredients, tags):
+        cum_weights = get_cum_weights(ingredients, INGREDIENT_POPULARITY)
+        ingredient_ids = range(1, ingredients + 1)
+        tag_ids = range(1, tags + 1)
+        return {
+            recipe_id: (
+                tuple(set(random.choices(
+                    ingredient_ids,
+                    cum_weights=cum_weights,
+                    k=random.randint(MIN_INGREDIENTS, MAX_INGREDIENTS),
+                ))),
+                get_tags_mask(
+                    random.sample(tag_ids, random.randint(1, len(tag_ids)))
+                ),
+            )
+            for recipe_id in recipe_ids
+        }
+
+    def report_time(self, name, started):
+        print(f'{name:<40} {perf_counter() - started:8.2f} с')
+
+    def report_recall(self, index, overlay, queries, options):
+        """Доля точной выдачи, которую находит быстрый поиск."""
+        found = expected = 0
+        for recipe_id in queries:
+            exact = find_similar(
+                index, overlay, recipe_id, options['limit'], exact=True
+            )
+            found += len(set(exact).intersection(
+                find_similar(index, overlay, recipe_id, options['limit'])
+            ))
+            expected += len(exact)
+        print(f'{"Полнота против точного поиска":<40} '
+              f'{found / (expected or 1):8.3f}')
+
+    def report_queries(self, name, index, overlay, queries, options):
+        timings = []
+        for recipe_id in queries:
+            started = perf_counter()
+            find_similar(index, overlay, recipe_id, options['limit'])
+            timings.append((perf_counter() - started) * 1000)
+        print(
+            f'{name:<40} '
+            + ' '.join(
+                f'p{percent} {percentile(timings, percent):8.2f} мс'
+                for percent in PERCENTILES
+            )
+        )
@@ -0,0 +1,39 @@
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError
+
+from core.tag_index import filter_by_tags
+from recipes.models import Recipe, Tag
+
+PAGE_LIMIT = 6
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время фильтрации рецептов по тегам: '
+        'join с DISTINCT против Recipe.tags_mask.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='+')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.filter(slug__in=options['slugs']))
+        if not tags:
+            raise CommandError('Теги не найдены.')
+        querysets = {
+            'join + DISTINCT': Recipe.objects.filter(
+                tags__slug__in=[tag.slug for tag in tags]
+            ).distinct(),
+            'tags_mask': filter_by_tags(Recipe.objects.all(), tags),
+        }
+        for name, queryset in querysets.items():
+            print(f'== {name}')
+            print(queryset.explain())
+            started = perf_counter()
+            for _ in range(options['repeat']):
+                count = queryset.count()
+                list(queryset[:PAGE_LIMIT])
+            elapsed = (perf_counter() - started) / options['repeat']
+            print(f'Рецептов: {count}, {elapsed * 1000:.2f} мс на запрос.')
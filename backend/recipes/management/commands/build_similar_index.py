@@ -0,0 +1,28 @@
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from core.similar import build_similar_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает индекс похожих рецептов по ингредиентам и тегам '
+        'в файл SIMILAR_INDEX_PATH. Воркеры подхватывают новый файл '
+        'сами; изменения рецептов между сборками применяются поверх '
+        'индекса из журнала в кэше.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.SIMILAR_INDEX_PATH)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        recipes = build_similar_index(options['path'])
+        print(
+            f'Рецептов в индексе: {recipes}, '
+            f'{os.path.getsize(options["path"]) / 2 ** 20:.1f} МБ, '
+            f'за {perf_counter() - started:.1f} с: {options["path"]}'
+        )
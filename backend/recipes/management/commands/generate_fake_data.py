@@ -0,0 +1,223 @@
+import random
+from itertools import accumulate
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+
+from core.conditional import bump_versions
+from core.constants import IMPORT_BATCH_SIZE
+from core.search import refresh_search_index
+from core.tag_index import get_tags_mask
+
+from recipes.models import (Cart, FavoriteRecipe, Ingredient,
+                            IngredientInRecipe, Recipe, Tag)
+from users.models import Subscription, User
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+DISHES = (
+    'Суп', 'Салат', 'Запеканка', 'Паста', 'Рагу', 'Пирог', 'Омлет',
+    'Каша', 'Плов', 'Котлеты', 'Рулет', 'Соус', 'Смузи', 'Лазанья',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Олег', 'Ольга', 'Петр', 'Юлия')
+LAST_NAMES = ('Иванова', 'Петров', 'Смирнова', 'Кузнецов', 'Попова')
+MIN_INGREDIENTS = 3
+MAX_INGREDIENTS = 12
+ACTIVITY_ALPHA = 1.5
+RECIPE_POPULARITY = 1.1
+AUTHOR_POPULARITY = 1.2
+INGREDIENT_POPULARITY = 1.0
+
+
+def get_cum_weights(size, exponent):
+    """Веса закона Ципфа: k-й элемент популярнее (k + 1)-го."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def get_activity(scale, limit):
+    """Число действий пользователя с распределением Парето."""
+    return min(int((random.paretovariate(ACTIVITY_ALPHA) - 1) * scale), limit)
+
+
+def batched(items, size=IMPORT_BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, '
+        'подписками, избранным и списками покупок для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--users', type=int,
+            help='По умолчанию десятая часть от числа рецептов.',
+        )
+        parser.add_argument(
+            '--activity', type=float, default=1.0,
+            help='Множитель числа подписок, избранного и покупок.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее сгенерированных пользователей и рецепты.',
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        started = perf_counter()
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).delete()
+            print(f'Удалено объектов: {deleted}.')
+        call_command('import_catalog', 'ingredients')
+        call_command('import_catalog', 'tags')
+        users = self.create_users(
+            options['users'] or max(options['recipes'] // 10, 10)
+        )
+        recipe_ids = self.create_recipes(users, options['recipes'])
+        self.create_relations(users, recipe_ids, options['activity'])
+        call_command('reconcile_recipe_counters')
+        call_command('rebuild_cart_totals')
+        call_command('rebuild_feeds')
+        call_command('build_similar_index')
+        for batch in batched(recipe_ids):
+            refresh_search_index(batch)
+        bump_versions('recipes')
+        print(f'Готово за {perf_counter() - started:.1f} с.')
+
+    def create_users(self, count):
+        first_id = self.get_last_id(User)
+        password = make_password(PASSWORD)
+        suffix = random.getrandbits(32)
+        for batch in batched(range(count)):
+            User.objects.bulk_create(
+                User(
+                    username=f'{USERNAME_PREFIX}{suffix}_{number}',
+                    email=f'{USERNAME_PREFIX}{suffix}_{number}@example.com',
+                    first_name=random.choice(FIRST_NAMES),
+                    last_name=random.choice(LAST_NAMES),
+                    password=password,
+                )
+                for number in batch
+            )
+        user_ids = list(User.objects.filter(
+            id__gt=first_id, username__startswith=USERNAME_PREFIX
+        ).order_by('id').values_list('id', flat=True))
+        print(f'Пользователей: {len(user_ids)}.')
+        return user_ids
+
+    def create_recipes(self, user_ids, count):
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        random.shuffle(ingredients)
+        ingredient_weights = get_cum_weights(
+            len(ingredients), INGREDIENT_POPULARITY
+        )
+        author_weights = get_cum_weights(len(user_ids), AUTHOR_POPULARITY)
+        first_id = self.get_last_id(Recipe)
+        for batch in batched(range(count)):
+            recipes, recipe_ingredients, recipe_tags = [], [], []
+            for _ in batch:
+                chosen = {
+                    ingredient[0]: ingredient
+                    for ingredient in random.choices(
+                        ingredients,
+                        cum_weights=ingredient_weights,
+                        k=random.randint(MIN_INGREDIENTS, MAX_INGREDIENTS),
+                    )
+                }
+                names = [name for _, name in chosen.values()]
+                tags = random.sample(tag_ids, random.randint(1, len(tag_ids)))
+                recipes.append(Recipe(
+                    author_id=random.choices(
+                        user_ids, cum_weights=author_weights
+                    )[0],
+                    name=f'{random.choice(DISHES)} с {names[0]}'[:200],
+                    text=f'Смешать {", ".join(names)} и готовить.',
+                    image='recipes/images/bench.jpg',
+                    cooking_time=random.randint(5, 180),
+                    tags_mask=get_tags_mask(tags),
+                ))
+                recipe_ingredients.append(chosen)
+                recipe_tags.append(tags)
+            with transaction.atomic():
+                last_id = self.get_last_id(Recipe)
+                Recipe.objects.bulk_create(recipes)
+                ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                    'id'
+                ).values_list('id', flat=True))
+                IngredientInRecipe.objects.bulk_create(
+                    IngredientInRecipe(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=random.randint(1, 500),
+                    )
+                    for recipe_id, chosen in zip(ids, recipe_ingredients)
+                    for ingredient_id in chosen
+                )
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id, tags in zip(ids, recipe_tags)
+                    for tag_id in tags
+                )
+        recipe_ids = list(Recipe.objects.filter(id__gt=first_id).order_by(
+            'id'
+        ).values_list('id', flat=True))
+        print(f'Рецептов: {len(recipe_ids)}.')
+        return recipe_ids
+
+    def create_relations(self, user_ids, recipe_ids, activity):
+        """Создаем подписки, избранное и покупки.
+
+        Число действий пользователя распределено по Парето, выбор рецептов
+        и авторов — по закону Ципфа: популярных немного.
+        """
+        recipes = random.sample(recipe_ids, len(recipe_ids))
+        recipe_weights = get_cum_weights(len(recipes), RECIPE_POPULARITY)
+        author_weights = get_cum_weights(len(user_ids), AUTHOR_POPULARITY)
+        relations = (
+            (FavoriteRecipe, 'recipe_id', recipes, recipe_weights, 3),
+            (Cart, 'recipe_id', recipes, recipe_weights, 1),
+            (Subscription, 'author_id', user_ids, author_weights, 2),
+        )
+        for model, field, population, weights, scale in relations:
+            created = 0
+            for batch in batched(self.generate_relations(
+                model, field, user_ids, population, weights, scale * activity
+            )):
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                created += len(batch)
+            print(f'{model._meta.verbose_name_plural}: {created}.')
+
+    def generate_relations(self, model, field, user_ids, population, weights,
+                           scale):
+        for user_id in user_ids:
+            count = get_activity(scale, len(population))
+            if count <= 0:
+                continue
+            for target_id in set(random.choices(
+                population, cum_weights=weights, k=count
+            )):
+                if model is Subscription and target_id == user_id:
+                    continue
+                yield model(user_id=user_id, **{field: target_id})
+
+    def get_last_id(self, model):
+        last = model.objects.order_by('-id').values_list('id', flat=True)
+        return last.first() or 0
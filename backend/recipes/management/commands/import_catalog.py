@@ -0,0 +1,168 @@
+import csv
+import json
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from core.cards import invalidate_recipe_cards
+from core.conditional import bump_versions
+from core.constants import IMPORT_BATCH_SIZE
+from core.ingredient_index import invalidate_ingredient_index
+
+from recipes.models import Ingredient, Recipe, Tag
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+CATALOGS = {
+    'ingredients': {
+        'model': Ingredient,
+        'fields': ('name', 'measurement_unit'),
+        'key': ('name', 'measurement_unit'),
+        'unique': (),
+        'file': 'ingredients.csv',
+    },
+    'tags': {
+        'model': Tag,
+        'fields': ('name', 'color', 'slug'),
+        'key': ('slug',),
+        'unique': (('name',), ('color',)),
+        'file': 'tags.csv',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты или теги из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog', choices=CATALOGS)
+        parser.add_argument(
+            '--file',
+            help='Путь к CSV или JSON файлу. По умолчанию файл из data/.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать изменения без записи в базу.',
+        )
+
+    def handle(self, *args, **options):
+        catalog = CATALOGS[options['catalog']]
+        path = Path(options['file'] or DATA_DIR / catalog['file'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        print(f'Загрузка данных из {path}')
+        started = perf_counter()
+        with transaction.atomic():
+            rows, to_create, to_update, conflicts = self.diff(
+                catalog, self.read_rows(path, catalog['fields'])
+            )
+            if not options['dry_run']:
+                try:
+                    self.write(catalog, to_create, to_update)
+                except IntegrityError as error:
+                    raise CommandError(
+                        f'Загрузка отменена, конфликт в базе: {error}'
+                    ) from error
+                if to_create or to_update:
+                    bump_versions(options['catalog'])
+        elapsed = perf_counter() - started
+        print(
+            f'Строк: {rows}, добавить: {len(to_create)}, '
+            f'обновить: {len(to_update)}, пропущено: {conflicts}'
+            f'{" (dry-run)" if options["dry_run"] else ""}. '
+            f'{elapsed:.3f} с, {rows / elapsed if elapsed else 0:.0f} строк/с.'
+        )
+
+    def read_rows(self, path, fields):
+        with open(path, newline='', encoding='utf-8') as f:
+            if path.suffix == '.json':
+                for item in json.load(f):
+                    yield tuple(item[field] for field in fields)
+                return
+            for row in csv.reader(f):
+                if row:
+                    yield tuple(row[:len(fields)])
+
+    def diff(self, catalog, rows):
+        """Разбираем строки на новые и измененные записи.
+
+        Строку, у которой значение уникального поля (кроме ключа) уже
+        занято другой записью в базе или в файле, пропускаем
+        и сообщаем о ней: иначе bulk_create/bulk_update упадет
+        на ограничении уникальности.
+        """
+        model, fields, key = (
+            catalog['model'], catalog['fields'], catalog['key']
+        )
+        key_positions = [fields.index(field) for field in key]
+        existing = {
+            tuple(getattr(obj, field) for field in key): obj
+            for obj in model.objects.only('id', *fields)
+        }
+        taken = {
+            unique: {
+                tuple(getattr(obj, field) for field in unique): obj_key
+                for obj_key, obj in existing.items()
+            }
+            for unique in catalog['unique']
+        }
+        to_create, to_update, count, conflicts = {}, {}, 0, 0
+        for count, row in enumerate(rows, start=1):
+            values = dict(zip(fields, row))
+            row_key = tuple(row[position] for position in key_positions)
+            conflict = self.find_conflict(taken, values, row_key)
+            if conflict is not None:
+                conflicts += 1
+                described = ', '.join(
+                    f'{field}={values[field]!r}' for field in conflict
+                )
+                print(
+                    f'Строка {count} пропущена: {described} '
+                    'уже есть у другой записи.'
+                )
+                continue
+            for unique, owners in taken.items():
+                owners[tuple(values[field] for field in unique)] = row_key
+            obj = existing.get(row_key)
+            if obj is None:
+                to_create[row_key] = model(**values)
+            elif any(getattr(obj, f) != v for f, v in values.items()):
+                for field, value in values.items():
+                    setattr(obj, field, value)
+                to_update[row_key] = obj
+        return (
+            count,
+            list(to_create.values()),
+            list(to_update.values()),
+            conflicts,
+        )
+
+    def find_conflict(self, taken, values, row_key):
+        for unique, owners in taken.items():
+            owner = owners.get(tuple(values[field] for field in unique))
+            if owner is not None and owner != row_key:
+                return unique
+        return None
+
+    def write(self, catalog, to_create, to_update):
+        model = catalog['model']
+        model.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+        if to_update:
+            model.objects.bulk_update(
+                to_update,
+                [field for field in catalog['fields']
+                 if field not in catalog['key']],
+                batch_size=IMPORT_BATCH_SIZE,
+            )
+        if model is Ingredient and to_create:
+            transaction.on_commit(invalidate_ingredient_index)
+        if model is Tag and to_update:
+            recipe_ids = list(Recipe.objects.filter(
+                tags__in=to_update
+            ).values_list('id', flat=True).distinct())
+            transaction.on_commit(
+                lambda: invalidate_recipe_cards(recipe_ids)
+            )
@@ -0,0 +1,423 @@
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+from collections import defaultdict
+from http import HTTPStatus
+from http.client import HTTPConnection, HTTPException
+from itertools import accumulate
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from recipes.management.commands.benchmark_api import (PERCENTILES,
+                                                       percentile)
+from users.models import User
+
+COLLECTION = (
+    settings.BASE_DIR.parent / 'postman-collection'
+    / 'diploma.postman_collection.json'
+)
+COLLECTION_USERS = ('username', 'secondUserUsername', 'thirdUserUsername')
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_WEIGHT = 10
+EXPECTED_ERROR_WEIGHT = 1
+REQUEST_TIMEOUT = 30
+SERVER_START_TIMEOUT = 30
+STATUS_CODES = {status.phrase: status.value for status in HTTPStatus}
+EXPECTED_STATUS = re.compile(
+    r'pm\.response\.status,.*?\.to\.be\.eql\(\s*"([^"]+)"', re.S
+)
+LOCAL_VARIABLE = re.compile(r'const (\w+) = _\.get\(responseData, "(\w+)"\)')
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(["\'](\w+)["\'],\s*(.+)$'
+)
+ITEM_FIELD = re.compile(
+    r'responseData\[(\d+)\]\.(\w+)(?:\.slice\(0,\s*(\d+)\))?'
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def get_extractors(script):
+    """Переменные, которые тест Postman сохраняет из ответа.
+
+    Скрипты не исполняются: распознаются только встречающиеся в коллекции
+    формы _.get(responseData, "поле") и responseData[N].поле.
+    """
+    fields = dict(LOCAL_VARIABLE.findall(script))
+    extractors = []
+    for line in script.splitlines():
+        match = SET_VARIABLE.search(line)
+        if match is None:
+            continue
+        expression = match[2].strip().rstrip(';')[:-1].strip()
+        if expression in fields:
+            extractors.append((match[1], [fields[expression]], None))
+            continue
+        item = ITEM_FIELD.fullmatch(expression)
+        if item is not None:
+            extractors.append((
+                match[1],
+                [int(item[1]), item[2]],
+                int(item[3]) if item[3] else None,
+            ))
+    return extractors
+
+
+def start_server(command, host, port, env=None):
+    """Запускаем сервер и ждем, пока он начнет принимать соединения."""
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    started = perf_counter()
+    while perf_counter() - started < SERVER_START_TIMEOUT:
+        try:
+            socket.create_connection((host, port)).close()
+        except OSError:
+            sleep(0.2)
+        else:
+            return server
+    server.terminate()
+    raise CommandError(f'Сервер не запустился на {host}:{port}.')
+
+
+class PostmanRequest:
+    """Запрос коллекции с ожидаемым статусом ответа."""
+
+    def __init__(self, item, folder, auth):
+        request = item['request']
+        self.name = f'{folder}/{item["name"]}'
+        self.method = request['method']
+        url = request['url']
+        self.url = url['raw'] if isinstance(url, dict) else url
+        self.body = request.get('body', {}).get('raw')
+        self.headers = {
+            header['key']: header['value']
+            for header in request.get('header', [])
+            if not header.get('disabled')
+        }
+        if self.body:
+            self.headers.setdefault('Content-Type', 'application/json')
+        auth = request.get('auth') or auth
+        if auth and auth['type'] == 'apikey':
+            fields = {field['key']: field['value'] for field in auth['apikey']}
+            self.headers[fields['key']] = fields['value']
+        script = '\n'.join(
+            line
+            for event in item.get('event', [])
+            if event['listen'] == 'test'
+            for line in event['script']['exec']
+        )
+        match = EXPECTED_STATUS.search(script)
+        self.expected = STATUS_CODES.get(match[1]) if match else None
+        self.extractors = get_extractors(script)
+        self.weight = (
+            READ_WEIGHT if self.method in SAFE_METHODS
+            else EXPECTED_ERROR_WEIGHT if (self.expected or 0) >= 400
+            else 0
+        )
+
+    def is_expected(self, status):
+        """Без проверки статуса в коллекции успешен любой 2xx и 3xx."""
+        if self.expected is None:
+            return status is not None and 200 <= status < 400
+        return status == self.expected
+
+
+def load_collection(path):
+    """Запросы коллекции в порядке выполнения и ее переменные."""
+    collection = json.loads(Path(path).read_text(encoding='utf-8'))
+
+    def walk(items, folder, auth):
+        for item in items:
+            if 'item' in item:
+                yield from walk(
+                    item['item'], item['name'], item.get('auth') or auth
+                )
+            else:
+                yield PostmanRequest(item, folder, auth)
+
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])
+    }
+    return (
+        list(walk(collection['item'], '', collection.get('auth'))),
+        variables,
+    )
+
+
+class Client:
+    """Отправка запросов коллекции с подстановкой переменных."""
+
+    def __init__(self, base_url, variables):
+        url = urlsplit(base_url)
+        if url.hostname not in LOCAL_HOSTS:
+            raise CommandError('Нагрузочный тест запускается только на '
+                               'локальном сервере.')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.variables = {**variables, 'baseUrl': base_url.rstrip('/')}
+
+    def connect(self):
+        return HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+
+    def render(self, text):
+        return VARIABLE.sub(
+            lambda match: str(self.variables.get(match[1], match[0])), text
+        )
+
+    def send(self, connection, request):
+        """Время ответа, статус и тело; статус None при сетевой ошибке."""
+        url = urlsplit(self.render(request.url))
+        path = quote(
+            url.path + (f'?{url.query}' if url.query else ''),
+            safe="/?&=%:+,;@!$'()*",
+        )
+        body = self.render(request.body).encode() if request.body else None
+        headers = {
+            key: self.render(value) for key, value in request.headers.items()
+        }
+        started = perf_counter()
+        try:
+            connection.request(request.method, path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, HTTPException):
+            connection.close()
+            return perf_counter() - started, None, None
+        return perf_counter() - started, response.status, content
+
+    def extract(self, request, content):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return
+        for name, path, length in request.extractors:
+            value = data
+            try:
+                for key in path:
+                    value = value[key]
+            except (KeyError, IndexError, TypeError):
+                continue
+            self.variables[name] = str(value)[:length]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест по postman-коллекции: коллекция прогоняется '
+        'один раз для получения токенов и id, затем ее запросы '
+        'выполняются со взвешенным случайным выбором на заданной '
+        'конкурентности или частоте. По умолчанию в нагрузку входят '
+        'чтения и запросы, ожидающие ошибку: их можно повторять.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', default=COLLECTION)
+        parser.add_argument(
+            '--base-url', help='По умолчанию baseUrl коллекции.'
+        )
+        parser.add_argument(
+            '--variable', action='append', default=[],
+            help='КЛЮЧ=ЗНАЧЕНИЕ: переопределить переменную коллекции.',
+        )
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--rps', type=float,
+            help='Целевая частота запросов; по умолчанию без ограничения.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30, help='Секунды.'
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0,
+            help='Средняя пауза между запросами одного клиента, мс.',
+        )
+        parser.add_argument(
+            '--weight', action='append', default=[],
+            help='ПОДСТРОКА=ВЕС для запросов, в названии которых есть '
+                 'подстрока. Можно указывать несколько раз.',
+        )
+        parser.add_argument(
+            '--start-server', choices=('gunicorn', 'runserver'),
+            help='Запустить сервер на время теста.',
+        )
+        parser.add_argument('--server-workers', type=int, default=2)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не удалять пользователей коллекции после теста.',
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', help='Сохранить отчет в JSON.')
+
+    def handle(self, *args, **options):
+        requests, variables = load_collection(options['collection'])
+        variables.update(
+            self.parse_options(options['variable'], 'КЛЮЧ=ЗНАЧЕНИЕ')
+        )
+        for pattern, weight in self.parse_options(
+            options['weight'], 'ПОДСТРОКА=ВЕС'
+        ):
+            for request in requests:
+                if pattern in request.name:
+                    request.weight = float(weight)
+        client = Client(
+            options['base_url'] or variables['baseUrl'], variables
+        )
+        random.seed(options['seed'])
+        server = self.start_server(client, options)
+        try:
+            self.reset(variables)
+            self.run_collection(client, requests)
+            scenarios = [request for request in requests if request.weight]
+            if not scenarios:
+                raise CommandError('Нет запросов с ненулевым весом.')
+            elapsed, samples = self.run_load(client, scenarios, options)
+        finally:
+            if not options['keep']:
+                self.reset(variables)
+            if server is not None:
+                server.terminate()
+                server.wait()
+        report = self.report(samples, elapsed)
+        if options['json']:
+            Path(options['json']).write_text(
+                json.dumps(report, ensure_ascii=False, indent=2)
+            )
+
+    def parse_options(self, options, expected):
+        pairs = []
+        for option in options:
+            key, separator, value = option.partition('=')
+            if not key or not separator:
+                raise CommandError(f'Ожидается {expected}: {option}')
+            pairs.append((key, value))
+        return pairs
+
+    def start_server(self, client, options):
+        if options['start_server'] is None:
+            return None
+        address = f'{client.host}:{client.port}'
+        command = (
+            [sys.executable, '-m', 'gunicorn', 'foodgram.wsgi:application',
+             '--bind', address, '--workers', str(options['server_workers'])]
+            if options['start_server'] == 'gunicorn'
+            else [sys.executable, 'manage.py', 'runserver', '--noreload',
+                  address]
+        )
+        return start_server(command, client.host, client.port)
+
+    def reset(self, variables):
+        """Удаляем пользователей коллекции и их объекты, как clear_db.sh."""
+        usernames = [json.loads(variables[name]) for name in COLLECTION_USERS]
+        deleted, _ = User.objects.filter(username__in=usernames).delete()
+        print(f'База очищена, удалено объектов: {deleted}.')
+
+    def run_collection(self, client, requests):
+        """Последовательный прогон коллекции: заполняет переменные.
+
+        Успешные удаления из конца коллекции пропускаются, чтобы рецепты,
+        подписки и списки покупок остались для нагрузки.
+        """
+        connection = client.connect()
+        requests = [
+            request for request in requests
+            if request.method != 'DELETE' or (request.expected or 0) >= 400
+        ]
+        failed = []
+        for request in requests:
+            _, status, content = client.send(connection, request)
+            if not request.is_expected(status):
+                failed.append(f'{request.name}: {status}')
+            elif content and request.extractors:
+                client.extract(request, content)
+        connection.close()
+        print(
+            f'Прогон коллекции: {len(requests) - len(failed)} из '
+            f'{len(requests)} ответов с ожидаемым статусом.'
+        )
+        for failure in failed:
+            print(f'  {failure}')
+
+    def run_load(self, client, scenarios, options):
+        cum_weights = list(accumulate(
+            request.weight for request in scenarios
+        ))
+        interval = 1 / options['rps'] if options['rps'] else 0
+        think_time = options['think_time'] / 1000
+        lock = Lock()
+        samples = []
+        started = perf_counter()
+        deadline = started + options['duration']
+        schedule = [started]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            connection = client.connect()
+            results = []
+            while True:
+                if interval:
+                    with lock:
+                        slot = max(schedule[0], perf_counter())
+                        schedule[0] = slot + interval
+                    if slot >= deadline:
+                        break
+                    sleep(max(slot - perf_counter(), 0))
+                if perf_counter() >= deadline:
+                    break
+                request = rng.choices(scenarios, cum_weights=cum_weights)[0]
+                latency, status, _ = client.send(connection, request)
+                results.append(
+                    (request.name, latency, request.is_expected(status))
+                )
+                if think_time:
+                    sleep(rng.expovariate(1 / think_time))
+            connection.close()
+            with lock:
+                samples.extend(results)
+
+        threads = [
+            Thread(target=worker, args=(random.random(),))
+            for _ in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return perf_counter() - started, samples
+
+    def report(self, samples, elapsed):
+        groups = defaultdict(list)
+        for name, latency, ok in samples:
+            groups[name].append((latency, ok))
+            groups['всего'].append((latency, ok))
+        report = {}
+        for name, results in sorted(groups.items()):
+            latencies = [latency * 1000 for latency, _ in results]
+            errors = sum(not ok for _, ok in results)
+            report[name] = {
+                'requests': len(results),
+                'errors': errors,
+                'error_rate': errors / len(results),
+                'throughput': len(results) / elapsed,
+                **{
+                    f'p{percent}': percentile(latencies, percent)
+                    for percent in PERCENTILES
+                },
+            }
+            result = report[name]
+            print(
+                f'{name:<90} {result["requests"]:7} запр. '
+                f'{result["throughput"]:8.1f} запр./с '
+                f'ошибок {result["error_rate"]:6.1%} '
+                + ' '.join(
+                    f'p{percent} {result[f"p{percent}"]:8.2f} мс'
+                    for percent in PERCENTILES
+                )
+            )
+        return report
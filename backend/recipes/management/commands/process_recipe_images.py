@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+
+from core.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии картинок для существующих рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать и рецепты, у которых копии уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_hash='')
+        processed = failed = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            try:
+                process_recipe_image(recipe_id)
+            except (OSError, ValueError) as error:
+                failed += 1
+                print(f'Рецепт {recipe_id}: {error}')
+                continue
+            processed += 1
+        print(
+            f'Обработка картинок завершена: {processed}, ошибок: {failed}.'
+        )
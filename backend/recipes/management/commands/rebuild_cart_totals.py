@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand, CommandError
+
+from core.shopping_cart import (get_live_cart_totals, get_stored_cart_totals,
+                                rebuild_cart_totals)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает суммы ингредиентов в списках покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            '--verify',
+            action='store_true',
+            help='Только сверить таблицу с живой агрегацией.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = self.find_mismatches()
+        print(f'Расхождений до пересчета: {len(mismatches)}')
+        for user_id, ingredient_id in mismatches:
+            print(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'в таблице {self.stored.get((user_id, ingredient_id), 0)}, '
+                f'по рецептам {self.live.get((user_id, ingredient_id), 0)}'
+            )
+        if options['check']:
+            if mismatches:
+                raise CommandError('Суммы в списках покупок расходятся.')
+            return
+        rebuild_cart_totals()
+        mismatches = self.find_mismatches()
+        if mismatches:
+            raise CommandError(
+                f'После пересчета осталось расхождений: {len(mismatches)}'
+            )
+        print('Пересчет списков покупок завершен.')
+
+    def find_mismatches(self):
+        self.live = get_live_cart_totals()
+        self.stored = get_stored_cart_totals()
+        return sorted(
+            key for key in self.live.keys() | self.stored.keys()
+            if self.live.get(key) != self.stored.get(key)
+        )
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from core.feed import backfill_feed
+from recipes.models import FeedEntry, FeedPullAuthor
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок: отмечает авторов, у которых больше '
+        'FEED_FANOUT_MAX_SUBSCRIBERS подписчиков, и заполняет ленты '
+        'последними рецептами остальных авторов.'
+    )
+
+    def handle(self, *args, **options):
+        pull_author_ids = User.objects.annotate(
+            subscribers=Count('author_in_subscription')
+        ).filter(
+            subscribers__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+        ).values_list('id', flat=True)
+        FeedPullAuthor.objects.bulk_create(
+            [FeedPullAuthor(author_id=author_id)
+             for author_id in pull_author_ids],
+            ignore_conflicts=True,
+        )
+        created = 0
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            for user_id, author_id in Subscription.objects.values_list(
+                'user_id', 'author_id'
+            ).iterator():
+                created += backfill_feed(user_id, author_id)
+        print(
+            f'Записей в лентах: {created}, авторов без раскладки: '
+            f'{FeedPullAuthor.objects.count()}.'
+        )
@@ -0,0 +1,53 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Cart, FavoriteRecipe, Recipe
+
+
+def count_for_recipe(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+                'recipe'
+            ).annotate(total=Count('id')).values('total')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного и списков покупок у рецептов. '
+        'Сервисы и сигналы держат их в актуальном состоянии; команда '
+        'нужна после записей без сигналов (bulk_create, SQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения.',
+        )
+
+    def handle(self, *args, **options):
+        live = {
+            'favorites_count': count_for_recipe(FavoriteRecipe),
+            'in_carts_count': count_for_recipe(Cart),
+        }
+        mismatched = Recipe.objects.annotate(
+            live_favorites_count=live['favorites_count'],
+            live_in_carts_count=live['in_carts_count'],
+        ).exclude(
+            Q(favorites_count=F('live_favorites_count'))
+            & Q(in_carts_count=F('live_in_carts_count'))
+        ).count()
+        print(f'Рецептов с расхождениями: {mismatched}')
+        if options['check']:
+            if mismatched:
+                raise CommandError('Счетчики рецептов расходятся.')
+            return
+        with transaction.atomic():
+            Recipe.objects.update(**live)
+        print('Счетчики рецептов пересчитаны.')
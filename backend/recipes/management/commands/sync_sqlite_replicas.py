@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+
+from core.constants import PRIMARY_DB
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файлы реплик DB_REPLICA_NAMES: '
+        'заменяет репликацию при локальной проверке маршрутизации чтений. '
+        'Между запусками реплики отстают от основной базы.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены, задайте '
+                               'DB_REPLICA_NAMES.')
+        primary = connections[PRIMARY_DB]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            name = settings.DATABASES[alias]['NAME']
+            with sqlite3.connect(name) as replica:
+                primary.connection.backup(replica)
+            replica.close()
+            print(f'{alias}: {name}')
@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 02:21
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAGS_MASK_BITS = 62
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    masks = defaultdict(int)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    ):
+        if 0 < tag_id <= TAGS_MASK_BITS:
+            masks[recipe_id] |= 1 << (tag_id - 1)
+    for recipe_id, mask in masks.items():
+        Recipe.objects.filter(id=recipe_id).update(tags_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 3.2 on 2026-10-18 02:33
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+SEARCH_TABLE = 'recipes_recipe_search'
+SEARCH_INDEX = 'recipe_search_vector_idx'
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+def fill_search_vector(apps):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ingredient_names = Coalesce(
+        Subquery(
+            IngredientInRecipe.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        ),
+        Value(''),
+    )
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def fill_search_table(apps, cursor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ingredients = {}
+    for recipe_id, name in IngredientInRecipe.objects.values_list(
+        'recipe_id', 'ingredient__name'
+    ):
+        ingredients.setdefault(recipe_id, []).append(normalize(name))
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, ingredients, text) '
+        'VALUES (%s, %s, %s, %s)',
+        [
+            (
+                recipe_id,
+                normalize(name),
+                ' '.join(ingredients.get(recipe_id, ())),
+                normalize(text),
+            )
+            for recipe_id, name, text in Recipe.objects.values_list(
+                'id', 'name', 'text'
+            )
+        ],
+    )
+
+
+def create_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE INDEX {SEARCH_INDEX} ON recipes_recipe '
+                'USING gin (search_vector)'
+            )
+            fill_search_vector(apps)
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+            'name, ingredients, text, '
+            'tokenize="unicode61 remove_diacritics 2")'
+        )
+        fill_search_table(apps, cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX {SEARCH_INDEX}')
+        else:
+            cursor.execute(f'DROP TABLE {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
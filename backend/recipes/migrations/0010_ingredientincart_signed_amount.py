@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredientincart',
+            name='amount',
+            field=models.IntegerField(default=0, verbose_name='Количество'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.db.models import UniqueConstraint
 
@@ -116,6 +117,12 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes/images/',
     )
+    image_hash = models.CharField(
+        verbose_name='Хеш картинки',
+        max_length=constants.IMAGE_HASH_LENGTH,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание',
         help_text='Опишите рецепт',
@@ -134,6 +141,12 @@ class Recipe(models.Model):
         help_text='Выбирете теги для рецепта',
         related_name='recipe_tags',
     )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Битовая маска тегов',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления (в минутах)',
         help_text='Введите время приготовления рецепта',
@@ -150,9 +163,38 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date', 'name',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', 'name', 'id'),
+                name='recipe_pub_date_name_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', 'id'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -259,3 +301,129 @@ class Cart(AbstractUsersRecipe):
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
         ordering = ('-id',)
+
+
+class IngredientInCart(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок.
+
+    Количество может стать отрицательным только при расхождении
+    с рецептами; его находит rebuild_cart_totals --verify.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='cart_ingredients',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        related_name='in_carts',
+        on_delete=models.CASCADE,
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=[
+                    'user',
+                    'ingredient',
+                ],
+                name='unique_user_cart_ingredient',
+            ),
+        )
+        ordering = ('user', 'ingredient',)
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+
+    def __str__(self):
+        return (
+            f'{self.user}: {self.ingredient.name} - '
+            f'{self.amount}{self.ingredient.measurement_unit}.'
+        )
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок.
+
+    Рецепт попадает в ленты подписчиков автора при публикации,
+    pub_date повторяет дату публикации рецепта, чтобы лента читалась
+    одним проходом по индексу.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=[
+                    'user',
+                    'recipe',
+                ],
+                name='unique_user_feed_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx',
+            ),
+        )
+        ordering = ('user', '-pub_date', '-recipe',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe_id}'
+
+
+class FeedPullAuthor(models.Model):
+    """Модель автора, рецепты которого читаются в ленту при чтении.
+
+    У таких авторов слишком много подписчиков, чтобы раскладывать
+    каждый рецепт по их лентам. Отметка не снимается: иначе рецепты,
+    опубликованные без раскладки, пропали бы из лент.
+    """
+
+    author = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        related_name='feed_pull',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата отметки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Автор без раскладки по лентам'
+        verbose_name_plural = 'Авторы без раскладки по лентам'
+
+    def __str__(self):
+        return str(self.author)
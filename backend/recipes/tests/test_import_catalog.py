@@ -0,0 +1,59 @@
+import csv
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.fixtures import clear_caches, create_tags
+from recipes.models import Tag
+
+TAG_ROWS = (
+    ('Завтрак', '#111111', 'morning'),
+    ('Полдник', '#E26C2D', 'snack'),
+    ('Поздний ужин', '#000000', 'dinner'),
+    ('Перекус', '#222222', 'bite'),
+    ('Перекус', '#333333', 'nibble'),
+    ('Бранч', '#49B64E', 'lunch'),
+)
+
+
+class ImportTagsTest(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        create_tags()
+
+    def import_tags(self, rows):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False, encoding='utf-8', newline=''
+        ) as f:
+            csv.writer(f).writerows(rows)
+        self.addCleanup(os.remove, f.name)
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('import_catalog', 'tags', file=f.name)
+        return output.getvalue()
+
+    def test_conflicting_rows_are_skipped(self):
+        output = self.import_tags(TAG_ROWS)
+        self.assertIn('добавить: 1, обновить: 2, пропущено: 3', output)
+        for line in ('Строка 1 ', 'Строка 2 ', 'Строка 5 '):
+            self.assertIn(line, output)
+        self.assertEqual(
+            set(Tag.objects.values_list('name', 'color', 'slug')),
+            {
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Бранч', '#49B64E', 'lunch'),
+                ('Поздний ужин', '#000000', 'dinner'),
+                ('Перекус', '#222222', 'bite'),
+            },
+        )
+
+    def test_reimport_is_idempotent(self):
+        self.import_tags(TAG_ROWS)
+        output = self.import_tags(TAG_ROWS)
+        self.assertIn('добавить: 0, обновить: 0, пропущено: 3', output)
@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+
+from recipes.management.commands.load_test import PostmanRequest
+
+
+def get_item(script=()):
+    return {
+        'name': 'Запрос',
+        'request': {'method': 'GET', 'url': '{{baseUrl}}/api/recipes/'},
+        'event': [{'listen': 'test', 'script': {'exec': list(script)}}],
+    }
+
+
+class PostmanRequestTest(SimpleTestCase):
+
+    def test_expected_status(self):
+        request = PostmanRequest(get_item((
+            'pm.test("Статус 404", function () {',
+            '    pm.expect(pm.response.status, "").to.be.eql("Not Found");',
+            '});',
+        )), 'Папка', None)
+        self.assertTrue(request.is_expected(404))
+        self.assertFalse(request.is_expected(200))
+
+    def test_without_status_test(self):
+        request = PostmanRequest(get_item(), 'Папка', None)
+        self.assertIsNone(request.expected)
+        for status, expected in ((200, True), (302, True), (400, False),
+                                 (500, False), (None, False)):
+            with self.subTest(status=status):
+                self.assertIs(request.is_expected(status), expected)